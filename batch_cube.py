@@ -0,0 +1,139 @@
+import numpy as np
+from move_maps import MOVES
+
+SOLVED_STATE = 'UUUUUUUUULLLLLLLLLFFFFFFFFFRRRRRRRRRBBBBBBBBBDDDDDDDDD'
+
+
+def _move_perm(move):
+    """Source facelet of every facelet after the move, so new_state = state[perm]."""
+    perm = np.arange(54, dtype=np.intp)
+    for src, dst in MOVES[move].items():
+        perm[dst] = src
+    return perm
+
+# One index permutation per entry of `move_maps.MOVES`
+MOVE_PERMS = {move: _move_perm(move) for move in MOVES}
+
+
+def _encode(state):
+    return np.frombuffer("".join(state).encode("ascii"), dtype=np.uint8)
+
+
+class BatchCube:
+    """
+    A batch of cubes held as an N x 54 uint8 array, one row of facelet colours per cube.
+
+    Colours are stored as their ASCII codes, so any facelet letters `Cube` uses
+    (including the masked "X" facelets of the pruning table masks) round-trip.
+    A move is a single fancy-indexing gather applied to every row at once.
+    """
+    def __init__(self, states):
+        self.states = np.asarray(states, dtype=np.uint8).reshape(-1, 54)
+
+    @classmethod
+    def solved(cls, n):
+        return cls(np.tile(_encode(SOLVED_STATE), (n, 1)))
+
+    @classmethod
+    def from_states(cls, states):
+        """Builds a batch from facelet strings (or lists), e.g. `Cube.state`s."""
+        return cls(np.stack([_encode(state) for state in states]) if states else np.empty((0, 54)))
+
+    def to_states(self):
+        return [row.tobytes().decode("ascii") for row in self.states]
+
+    def __len__(self):
+        return len(self.states)
+
+    def copy(self):
+        return BatchCube(self.states.copy())
+
+    def rotate(self, moves):
+        """Applies the same move sequence to every cube."""
+        for move in moves.split(" "):
+            if move != '':
+                self.states = self.states[:, MOVE_PERMS[move]]
+
+    def rotate_each(self, sequences):
+        """
+        Applies a different move sequence to each cube.
+
+        Rows are grouped by the move they make at each step, so the work is one
+        gather per distinct move per step rather than one per cube.
+
+        Args:
+            sequences (list of str): One move sequence per cube.
+        """
+        if len(sequences) != len(self.states):
+            raise ValueError(f"Got {len(sequences)} move sequences for {len(self.states)} cubes")
+        split = [[move for move in sequence.split(" ") if move != ''] for sequence in sequences]
+        for step in range(max(map(len, split), default=0)):
+            rows_by_move = {}
+            for row, sequence in enumerate(split):
+                if step < len(sequence):
+                    rows_by_move.setdefault(sequence[step], []).append(row)
+            for move, rows in rows_by_move.items():
+                rows = np.array(rows, dtype=np.intp)
+                self.states[rows] = self.states[rows][:, MOVE_PERMS[move]]
+
+    def expand(self, moves):
+        """
+        Returns a new batch holding every cube followed by each move, cube-major:
+        row i * len(moves) + j is cube i after moves[j].
+        """
+        perms = np.stack([MOVE_PERMS[move] for move in moves])
+        return BatchCube(self.states[:, perms].reshape(-1, 54))
+
+    def unique(self):
+        """Returns the batch without duplicate cubes, in sorted row order."""
+        return BatchCube(np.unique(_row_keys(self.states)).view(np.uint8).reshape(-1, 54))
+
+    def is_solved(self):
+        """Boolean array, True for each cube whose faces are each a single colour."""
+        faces = self.states.reshape(-1, 6, 9)
+        return (faces == faces[:, :, 4:5]).all(axis=(1, 2))
+
+
+def verify_solutions(scrambles, solutions):
+    """
+    Checks many solutions at once.
+
+    Args:
+        scrambles (list of str): Scramble move sequences.
+        solutions (list of str): The solution found for each scramble.
+
+    Returns:
+        numpy.ndarray: True where applying the solution after the scramble solves the cube.
+    """
+    batch = BatchCube.solved(len(scrambles))
+    batch.rotate_each([f"{scramble} {solution}" for scramble, solution in zip(scrambles, solutions)])
+    return batch.is_solved()
+
+
+def _row_keys(states):
+    """Views each 54-byte row as one opaque value, so rows sort and compare as a whole."""
+    return np.ascontiguousarray(states).view(np.dtype((np.void, 54))).ravel()
+
+def gen_pruning_table(solved_states, depth, moveset):
+    """
+    Batched `rubiks_cube_solver.gen_pruning_table`, building the same {state: depth} dict.
+
+    Each layer expands the whole frontier with `BatchCube.expand`, makes the children
+    unique and drops the states already seen with a sorted search, all as array
+    operations; only the final dict is built state by state.
+    """
+    frontier = BatchCube.from_states(solved_states).unique()
+    seen = np.sort(_row_keys(frontier.states))
+    layers = [frontier]
+
+    for i in range(1, depth + 1):
+        children = frontier.expand(moveset).unique()
+        keys = _row_keys(children.states)
+        positions = np.minimum(np.searchsorted(seen, keys), len(seen) - 1)
+        frontier = BatchCube(children.states[seen[positions] != keys])
+        if not len(frontier):
+            break
+        seen = np.sort(np.concatenate([seen, _row_keys(frontier.states)]))
+        layers.append(frontier)
+
+    return {state: i for i, layer in enumerate(layers) for state in layer.to_states()}
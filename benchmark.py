@@ -0,0 +1,378 @@
+"""
+Reproducible solver benchmarks.
+
+Runs a seeded scramble corpus, plus a few stored hard cases, through the solver
+engines and writes the results as JSON:
+
+    python benchmark.py run --corpus standard --output results.json
+    python benchmark.py compare baseline.json results.json
+
+`table_load_s` times loading the tables in the benchmark process, from the table
+cache when it is warm (`tables_built` counts the ones that were not). `run --cold`
+also times building every table from scratch in a child process, as `table_build_s`.
+
+`compare` exits with status 1 when a metric got worse by more than the threshold.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timezone
+from timeit import default_timer
+from search_stats import SolveStats
+import table_cache
+
+BENCHMARK_VERSION = 1
+
+# Corpus name: (seed, number of scrambles, scramble length)
+CORPORA = {
+    "smoke": (1, 20, 25),
+    "standard": (2019, 200, 25),
+    "large": (4242, 2000, 25),
+}
+
+# Positions known to be hard on (or odd for) the solvers, run with every corpus
+PATHOLOGICAL = {
+    "superflip": "U R2 F B R B2 R U2 L B2 R U' D' R2 F R' L B2 U2 F2",
+    "checkerboard": "U2 D2 F2 B2 L2 R2",
+    "cube in cube": "F L F U' R U F2 L2 U' L' B D' B' L2 U",
+    "six spot": "U D' R L' F B' U D'",
+    "solved": "",
+}
+
+PERCENTILES = (50, 90, 99)
+# Relative increase of a metric that counts as a regression
+DEFAULT_THRESHOLD = 0.10
+# Smallest slowdown of a single pathological solve that counts as a regression
+MIN_TIME_CHANGE_MS = 1.0
+
+
+def corpus_scrambles(name):
+    """The seeded scrambles of a corpus, the same on every run and machine."""
+    from rubiks_cube_solver import get_random_scramble, g0_moves
+
+    seed, count, length = CORPORA[name]
+    rng = random.Random(seed)
+    return [get_random_scramble(g0_moves, length, rng) for _ in range(count)]
+
+def summarize(values):
+    """Mean, nearest-rank percentiles and maximum of a list of numbers."""
+    if not values:
+        return {}
+    values = sorted(values)
+    summary = {"mean": sum(values) / len(values)}
+    for p in PERCENTILES:
+        summary[f"p{p}"] = values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+    summary["max"] = values[-1]
+    return summary
+
+def peak_rss_kb():
+    """Peak resident memory of this process, or None where the platform can't tell."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+### Engines ###
+# Each returns (table load seconds, pruning table bytes) when loaded, and a
+# (solution, time_ms, nodes, phase_times_ms) solve of one scramble
+
+def load_thistlethwaite():
+    t1 = default_timer()
+    import rubiks_cube_solver as solver  # Loads (or builds) the tables on first import
+    t2 = default_timer()
+    tables = (solver.g0_table, solver.g1_table, solver.g2_table, solver.g3_table)
+    return t2 - t1, sum(table.nbytes() for table in tables)
+
+def solve_thistlethwaite(scramble, time_budget, memo):
+    import rubiks_cube_solver as solver
+
+    cube = solver.Cube()
+    cube.rotate(scramble)
+    stats = SolveStats()
+    phases = solver.solve_phases(cube, solver.g0_table, solver.g1_table, solver.g2_table,
+                                 solver.g2_solved_states, solver.g3_table, memo=memo, stats=stats)
+    solution = None if phases is None else solver.join_phases(phases)
+    phase_times = {phase: phase_stats.time * 1000 for phase, phase_stats in stats.phases.items()}
+    return solution, stats.time * 1000, stats.nodes, phase_times
+
+def load_kociemba():
+    from two_phase import load_tables
+
+    t1 = default_timer()
+    tables = load_tables()
+    t2 = default_timer()
+    pruning_tables = (tables.twist_slice, tables.flip_slice, tables.corner_e_slice, tables.edge_e_slice)
+    return t2 - t1, sum(table.nbytes() for table in pruning_tables)
+
+def solve_kociemba(scramble, time_budget, memo):
+    from coordinates import SOLVED_STATE, facelets_to_cubie, apply_moves
+    from two_phase import two_phase_solutions
+
+    cubie = apply_moves(facelets_to_cubie(SOLVED_STATE), scramble)
+    stats = SolveStats()
+    solution, first_ms = None, None
+    t1 = default_timer()
+    for solution in two_phase_solutions(cubie, t1 + time_budget, stats=stats):
+        if first_ms is None:
+            first_ms = (default_timer() - t1) * 1000
+    total_ms = (default_timer() - t1) * 1000
+    return solution, total_ms, stats.nodes, {"first solution": first_ms or total_ms}
+
+ENGINES = {
+    "thistlethwaite": (load_thistlethwaite, solve_thistlethwaite),
+    "kociemba": (load_kociemba, solve_kociemba),
+}
+
+
+def measure_table_build(engine):
+    """
+    Loads an engine's tables in a child process with an empty table cache, so
+    every table is built.
+
+    Returns:
+        tuple: (seconds the load took, number of tables built).
+    """
+    code = ("import json, benchmark, table_cache; "
+            f"load_s, _ = benchmark.ENGINES[{engine!r}][0](); "
+            "print(json.dumps([load_s, table_cache.tables_built]))")
+    with tempfile.TemporaryDirectory() as cache_dir:
+        env = {name: value for name, value in os.environ.items() if name != "RUBIKS_SHARED_TABLES"}
+        env["RUBIKS_TABLE_CACHE"] = cache_dir
+        result = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True,
+                                check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    # The solver reports on stdout as it loads, the numbers are the last line
+    load_s, built = json.loads(result.stdout.splitlines()[-1])
+    return load_s, built
+
+def is_solution(scramble, solution):
+    from coordinates import SOLVED_STATE, facelets_to_cubie, apply_moves
+
+    solved = facelets_to_cubie(SOLVED_STATE)
+    return apply_moves(apply_moves(solved, scramble), solution) == solved
+
+def run_engine(engine, scrambles, time_budget=1.0, memo=False):
+    """
+    Benchmarks one (loaded) engine on a list of scrambles and the pathological cases.
+
+    Args:
+        engine (str): Key of `ENGINES`.
+        scrambles (list of str): The corpus.
+        time_budget (float): Per scramble budget of the two-phase engine.
+        memo (bool): Let the Thistlethwaite phases reuse earlier phase solutions
+            (see `rubiks_cube_solver.phase_memo`); off measures every search.
+
+    Returns:
+        dict: The engine's results.
+    """
+    solve = ENGINES[engine][1]
+    phase_memo = None
+    if memo:
+        from solution_cache import PhaseMemo
+        phase_memo = PhaseMemo()
+
+    times, moves, phase_times = [], [], {}
+    solved = nodes = 0
+    for scramble in scrambles:
+        solution, time_ms, scramble_nodes, scramble_phase_times = solve(scramble, time_budget, phase_memo)
+        times.append(time_ms)
+        nodes += scramble_nodes
+        for phase, phase_ms in scramble_phase_times.items():
+            phase_times.setdefault(phase, []).append(phase_ms)
+        if solution is not None and is_solution(scramble, solution):
+            solved += 1
+            moves.append(len(solution.split()))
+
+    pathological = {}
+    for name, scramble in PATHOLOGICAL.items():
+        solution, time_ms, case_nodes, _ = solve(scramble, time_budget, phase_memo)
+        pathological[name] = {
+            "solved": solution is not None and is_solution(scramble, solution),
+            "moves": None if solution is None else len(solution.split()),
+            "time_ms": time_ms,
+            "nodes": case_nodes,
+        }
+
+    search_s = sum(times) / 1000
+    return {
+        "scrambles": len(scrambles),
+        "solved": solved,
+        "latency_ms": {
+            "total": summarize(times),
+            "phases": {phase: summarize(values) for phase, values in phase_times.items()},
+        },
+        "nodes": nodes,
+        "nodes_per_s": nodes / search_s if search_s else 0.0,
+        "moves": summarize(moves),
+        "pathological": pathological,
+    }
+
+def run_benchmark(corpus="standard", engines=("thistlethwaite",), time_budget=1.0, memo=False, cold=False):
+    """
+    Args:
+        cold (bool): Also time building each engine's tables from scratch, see
+            `measure_table_build`.
+
+    Returns:
+        dict: JSON-ready results of every engine on the corpus, with the settings
+              needed to reproduce them.
+    """
+    seed, count, length = CORPORA[corpus]
+    results = {
+        "version": BENCHMARK_VERSION,
+        "corpus": {"name": corpus, "seed": seed, "scrambles": count, "length": length},
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "env": {name: value for name, value in os.environ.items() if name.startswith("RUBIKS_")},
+        "time_budget": time_budget,
+        "memo": memo,
+        "cold": cold,
+        "engines": {},
+    }
+    # Load every engine before making the corpus, which imports the Thistlethwaite
+    # solver and so would load its tables untimed
+    loads = {}
+    for engine in engines:
+        built = table_cache.tables_built
+        loads[engine] = (*ENGINES[engine][0](), table_cache.tables_built - built)
+    scrambles = corpus_scrambles(corpus)
+    for engine in engines:
+        load_s, table_bytes, built = loads[engine]
+        results["engines"][engine] = {
+            "table_load_s": load_s,
+            "tables_built": built,
+            "table_build_s": measure_table_build(engine)[0] if cold else None,
+            "pruning_table_bytes": table_bytes,
+            **run_engine(engine, scrambles, time_budget, memo),
+        }
+    results["peak_rss_kb"] = peak_rss_kb()
+    return results
+
+
+### Comparing results ###
+
+def _metrics(engine_results):
+    """(name, value, higher_is_worse) of the metrics compared between runs."""
+    latency = engine_results["latency_ms"]
+    metrics = [("solved", engine_results["solved"], False)]
+    for p in ("p50", "p90"):
+        metrics.append((f"latency total {p}", latency["total"].get(p), True))
+        for phase, summary in latency["phases"].items():
+            metrics.append((f"latency {phase} {p}", summary.get(p), True))
+    metrics.append(("nodes", engine_results["nodes"], True))
+    metrics.append(("moves mean", engine_results["moves"].get("mean"), True))
+    # A load that had to build tables is not comparable with one from the cache
+    load_s = None if engine_results.get("tables_built") else engine_results["table_load_s"]
+    metrics.append(("table_load_s", load_s, True))
+    metrics.append(("table_build_s", engine_results.get("table_build_s"), True))
+    metrics.append(("pruning_table_bytes", engine_results["pruning_table_bytes"], True))
+    for case, result in engine_results["pathological"].items():
+        metrics.append((f"{case} solved", result["solved"], False))
+        metrics.append((f"{case} moves", result["moves"], True))
+        metrics.append((f"{case} time_ms", result["time_ms"], True))
+        metrics.append((f"{case} nodes", result["nodes"], True))
+    return metrics
+
+def compare_results(old, new, threshold=DEFAULT_THRESHOLD):
+    """
+    Finds the metrics that got worse between two benchmark runs.
+
+    Args:
+        old, new (dict): Results of `run_benchmark` on the same corpus.
+        threshold (float): Relative change of a metric that counts as a regression.
+
+    Returns:
+        list: (engine, metric, old value, new value) of every regression.
+    """
+    if old["corpus"] != new["corpus"]:
+        raise ValueError(f"Results are for different corpora: {old['corpus']} and {new['corpus']}")
+    regressions = []
+    for engine in old["engines"].keys() & new["engines"].keys():
+        old_metrics = {name: value for name, value, _ in _metrics(old["engines"][engine])}
+        for name, new_value, higher_is_worse in _metrics(new["engines"][engine]):
+            old_value = old_metrics.get(name)
+            if old_value is None or new_value is None:
+                continue
+            change = new_value - old_value if higher_is_worse else old_value - new_value
+            # Timings are noisy, but every scramble that is no longer solved counts
+            if name == "solved" or name.endswith(" solved"):
+                tolerance = 0
+            elif name.endswith(" time_ms"):
+                # A single solve of an easy case takes well under a millisecond
+                tolerance = max(threshold * abs(old_value), MIN_TIME_CHANGE_MS)
+            else:
+                tolerance = threshold * abs(old_value)
+            if change > tolerance:
+                regressions.append((engine, name, old_value, new_value))
+    return sorted(regressions)
+
+
+def _print_results(results):
+    print(f"Corpus {results['corpus']['name']} ({results['corpus']['scrambles']} scrambles)")
+    for engine, engine_results in results["engines"].items():
+        latency = engine_results["latency_ms"]
+        print(f"\n{engine}: {engine_results['solved']}/{engine_results['scrambles']} solved, "
+              f"{engine_results['moves'].get('mean', 0):.1f} moves, "
+              f"tables {engine_results['pruning_table_bytes'] / 2**20:.1f} MiB "
+              f"loaded in {engine_results['table_load_s']:.2f}s")
+        if engine_results.get("tables_built"):
+            print(f"  {engine_results['tables_built']} tables were built, not loaded from the cache")
+        if engine_results.get("table_build_s") is not None:
+            print(f"  tables built from scratch in {engine_results['table_build_s']:.2f}s")
+        for phase, summary in [("total", latency["total"])] + list(latency["phases"].items()):
+            print(f"  {phase:>16}: " + "  ".join(f"{k} {v:.2f}ms" for k, v in summary.items()))
+        print(f"  {engine_results['nodes']} nodes, {engine_results['nodes_per_s']:.0f} nodes/s")
+        for name, case in engine_results["pathological"].items():
+            print(f"  {name:>16}: {case['moves']} moves in {case['time_ms']:.2f}ms")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="benchmark the engines on a corpus")
+    run.add_argument("--corpus", choices=CORPORA, default="standard")
+    run.add_argument("--engine", choices=ENGINES, action="append",
+                     help="engine to run, may be repeated (default: thistlethwaite)")
+    run.add_argument("--time-budget", type=float, default=1.0,
+                     help="seconds per scramble for the two-phase engine")
+    run.add_argument("--memo", action="store_true", help="reuse phase solutions between scrambles")
+    run.add_argument("--cold", action="store_true", help="also time building the tables with an empty cache")
+    run.add_argument("--output", help="file to write the JSON results to")
+
+    compare = commands.add_parser("compare", help="flag regressions between two result files")
+    compare.add_argument("old")
+    compare.add_argument("new")
+    compare.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        results = run_benchmark(args.corpus, args.engine or ["thistlethwaite"], args.time_budget, args.memo,
+                                args.cold)
+        _print_results(results)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(results, f, indent=2)
+        return 0
+
+    with open(args.old) as f:
+        old = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    regressions = compare_results(old, new, args.threshold)
+    for engine, name, old_value, new_value in regressions:
+        print(f"{engine}: {name} regressed from {old_value:.6g} to {new_value:.6g}")
+    if not regressions:
+        print("No regressions.")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
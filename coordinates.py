@@ -0,0 +1,472 @@
+from math import comb
+from collections import deque
+from functools import lru_cache
+from move_maps import MOVES, HTM_MOVES
+from table_cache import cached_table
+
+SOLVED_STATE = 'UUUUUUUUULLLLLLLLLFFFFFFFFFRRRRRRRRRBBBBBBBBBDDDDDDDDD'
+
+# Facelet positions of each corner slot, U/D facelet first (URF, UFL, ULB, UBR, DFR, DLF, DBL, DRB)
+CORNER_FACELETS = [
+    [8,  27, 20],
+    [6,  18, 11],
+    [0,   9, 38],
+    [2,  36, 29],
+    [47, 26, 33],
+    [45, 17, 24],
+    [51, 44, 15],
+    [53, 35, 42],
+]
+CORNER_COLORS = [
+    ('U', 'R', 'F'),
+    ('U', 'F', 'L'),
+    ('U', 'L', 'B'),
+    ('U', 'B', 'R'),
+    ('D', 'F', 'R'),
+    ('D', 'L', 'F'),
+    ('D', 'B', 'L'),
+    ('D', 'R', 'B'),
+]
+
+# Facelet positions of each edge slot (UR, UF, UL, UB, DR, DF, DL, DB, FR, FL, BL, BR)
+EDGE_FACELETS = [
+    [5, 28],
+    [7, 19],
+    [3, 10],
+    [1, 37],
+    [50, 34],
+    [46, 25],
+    [48, 16],
+    [52, 43],
+    [23, 30],
+    [21, 14],
+    [41, 12],
+    [39, 32],
+]
+EDGE_COLORS = [
+    ('U', 'R'),
+    ('U', 'F'),
+    ('U', 'L'),
+    ('U', 'B'),
+    ('D', 'R'),
+    ('D', 'F'),
+    ('D', 'L'),
+    ('D', 'B'),
+    ('F', 'R'),
+    ('F', 'L'),
+    ('B', 'L'),
+    ('B', 'R'),
+]
+
+E_SLICE_EDGES = (8, 9, 10, 11)
+M_SLICE_EDGES = (1, 3, 5, 7)
+S_SLICE_EDGES = (0, 2, 4, 6)
+U_EDGES = (0, 1, 2, 3)
+D_EDGES = (4, 5, 6, 7)
+
+N_FLIP = 2048
+N_TWIST = 2187
+N_SLICE = 495
+N_CORNER_PERM = 40320
+N_G3_CORNER_PERM = 96
+N_M_SLICE = 70
+N_SLICE_PERM = 24 * 24 * 24
+N_UD_EDGE_PERM = 40320
+N_E_SLICE_PERM = 24
+N_EDGE4_PERM = N_SLICE * 24
+
+
+def facelets_to_cubie(state):
+    """
+    Converts a 54-facelet colour state into cubie level permutation and orientation.
+
+    Args:
+        state (str or list): Facelet colours in the same layout as `Cube.state`.
+
+    Returns:
+        tuple: (cp, co, ep, eo) lists where cp[i] is the corner in slot i,
+            co[i] its twist, ep[i] the edge in slot i and eo[i] its flip.
+    """
+    cp, co, ep, eo = [], [], [], []
+    for slot in CORNER_FACELETS:
+        colors = [state[i] for i in slot]
+        for ori in range(3):
+            if colors[ori] in 'UD':
+                break
+        else:
+            raise ValueError(f"Invalid corner colours {colors}")
+        piece_colors = tuple(colors[(k + ori) % 3] for k in range(3))
+        if piece_colors not in CORNER_COLORS:
+            raise ValueError(f"Invalid corner colours {colors}")
+        cp.append(CORNER_COLORS.index(piece_colors))
+        co.append(ori)
+
+    for slot in EDGE_FACELETS:
+        colors = (state[slot[0]], state[slot[1]])
+        if colors in EDGE_COLORS:
+            ep.append(EDGE_COLORS.index(colors))
+            eo.append(0)
+        elif colors[::-1] in EDGE_COLORS:
+            ep.append(EDGE_COLORS.index(colors[::-1]))
+            eo.append(1)
+        else:
+            raise ValueError(f"Invalid edge colours {colors}")
+    return cp, co, ep, eo
+
+
+def cubie_to_facelets(cubie):
+    """Converts a (cp, co, ep, eo) cubie state back into a 54-facelet string."""
+    cp, co, ep, eo = cubie
+    facelets = list(SOLVED_STATE)
+    for i in range(8):
+        for j in range(3):
+            facelets[CORNER_FACELETS[i][j]] = CORNER_COLORS[cp[i]][(j - co[i]) % 3]
+    for i in range(12):
+        for j in range(2):
+            facelets[EDGE_FACELETS[i][j]] = EDGE_COLORS[ep[i]][(j - eo[i]) % 2]
+    return "".join(facelets)
+
+
+def facelet_move_to_cubie(move):
+    """Derives the cubie form of a face turn from its facelet map in `move_maps.MOVES`."""
+    state = list(SOLVED_STATE)
+    for src, dst in MOVES[move].items():
+        state[dst] = SOLVED_STATE[src]
+    return facelets_to_cubie(state)
+
+
+CUBIE_MOVES = {move: facelet_move_to_cubie(move) for move in HTM_MOVES}
+
+
+def apply_move(cubie, move):
+    """Returns the cubie state reached by applying a single face turn."""
+    cp, co, ep, eo = cubie
+    m_cp, m_co, m_ep, m_eo = CUBIE_MOVES[move]
+    return (
+        [cp[m_cp[i]] for i in range(8)],
+        [(co[m_cp[i]] + m_co[i]) % 3 for i in range(8)],
+        [ep[m_ep[i]] for i in range(12)],
+        [(eo[m_ep[i]] + m_eo[i]) % 2 for i in range(12)],
+    )
+
+
+def apply_moves(cubie, moves):
+    for move in moves.split(" "):
+        if move != '':
+            cubie = apply_move(cubie, move)
+    return cubie
+
+
+# Axis of each outer face and its position along it; turns of opposite faces commute
+FACE_AXES = {"U": (0, 0), "D": (0, 1), "L": (1, 0), "R": (1, 1), "F": (2, 0), "B": (2, 1)}
+# Clockwise quarter turns of each move suffix
+TURN_POWERS = {"": 1, "'": 3, "2": 2}
+
+@lru_cache(maxsize=None)
+def canonical_successors(moves):
+    """
+    Precomputes which moves may follow each other in a canonical move sequence.
+
+    A canonical sequence never turns a face twice in a row when the two turns
+    could be replaced by fewer moves of the set (U U is allowed in a set with U
+    but no U2), and turns commuting opposite faces only in U-D, L-R, F-B order.
+    Every position keeps a shortest canonical sequence: sorting a run of turns on
+    one axis into that order keeps its length, and a shortest sequence cannot
+    contain a pair that fewer moves replace.
+
+    Args:
+        moves (tuple): The move set, face turns like U, U' and U2.
+
+    Returns:
+        list: successors[i] holds the indices of the moves allowed after moves[i];
+              the extra last entry lists the moves allowed at the start of a sequence.
+    """
+    powers = {}
+    for move in moves:
+        powers.setdefault(move[0], set()).add(TURN_POWERS[move[1:]])
+
+    successors = []
+    for prev in list(moves) + [None]:
+        allowed = []
+        for i, move in enumerate(moves):
+            if prev is not None:
+                if move[0] == prev[0]:
+                    turns = (TURN_POWERS[prev[1:]] + TURN_POWERS[move[1:]]) % 4
+                    if turns == 0 or turns in powers[move[0]]:
+                        continue
+                prev_axis, axis = FACE_AXES.get(prev[0]), FACE_AXES.get(move[0])
+                if prev_axis and axis and prev_axis[0] == axis[0] and axis[1] < prev_axis[1]:
+                    continue
+            allowed.append(i)
+        successors.append(allowed)
+    return successors
+
+
+### Coordinate encodings ###
+
+def get_twist(co):
+    index = 0
+    for i in range(7):
+        index = 3 * index + co[i]
+    return index
+
+def set_twist(index):
+    co = [0] * 8
+    total = 0
+    for i in range(6, -1, -1):
+        co[i] = index % 3
+        total += co[i]
+        index //= 3
+    co[7] = -total % 3
+    return co
+
+def get_flip(eo):
+    index = 0
+    for i in range(11):
+        index = 2 * index + eo[i]
+    return index
+
+def set_flip(index):
+    eo = [0] * 12
+    total = 0
+    for i in range(10, -1, -1):
+        eo[i] = index % 2
+        total += eo[i]
+        index //= 2
+    eo[11] = total % 2
+    return eo
+
+def comb_index(occupied):
+    """Ranks the set of True positions in `occupied` among all subsets of the same size."""
+    index = 0
+    k = 0
+    n = len(occupied)
+    for j in range(n - 1, -1, -1):
+        if occupied[j]:
+            index += comb(n - 1 - j, k + 1)
+            k += 1
+    return index
+
+def comb_from_index(index, n, k):
+    occupied = [False] * n
+    for j in range(n):
+        if k == 0:
+            break
+        c = comb(n - 1 - j, k)
+        if index >= c:
+            index -= c
+            occupied[j] = True
+            k -= 1
+    return occupied
+
+def perm_index(perm):
+    """Lexicographic rank of a permutation of distinct comparable items."""
+    index = 0
+    n = len(perm)
+    for i in range(n):
+        smaller = sum(1 for j in range(i + 1, n) if perm[j] < perm[i])
+        index = index * (n - i) + smaller
+    return index
+
+def perm_from_index(index, n):
+    digits = []
+    for radix in range(1, n + 1):
+        digits.append(index % radix)
+        index //= radix
+    items = list(range(n))
+    return [items.pop(d) for d in reversed(digits)]
+
+def get_slice(ep):
+    """UD-slice coordinate: which slots hold the four E-slice edges."""
+    return comb_index([piece in E_SLICE_EDGES for piece in ep])
+
+def get_m_slice(ep):
+    """Which of the eight U/D edge slots hold M-slice edges (meaningful once in G2)."""
+    return comb_index([ep[i] in M_SLICE_EDGES for i in range(8)])
+
+def get_slice_perm(ep):
+    """Relative order of the edges inside the M, S and E slices (meaningful once in G3)."""
+    index = 0
+    for slots in (M_SLICE_EDGES, S_SLICE_EDGES, E_SLICE_EDGES):
+        index = 24 * index + perm_index([ep[i] for i in slots])
+    return index
+
+def get_ud_edge_perm(ep):
+    """Permutation of the eight U/D layer edges (meaningful once the E-slice edges are home)."""
+    return perm_index(ep[:8])
+
+def get_e_slice_perm(ep):
+    """Permutation of the four E-slice edges within the E slice."""
+    return perm_index(ep[8:])
+
+def get_edge4_perm(ep, edges):
+    """
+    Slots and order of four given edges, meaningful in any state: the rank of the
+    set of slots they occupy * 24 + the permutation they appear in.
+
+    For the E-slice edges in the E slice this is get_slice * 24 + get_e_slice_perm.
+    """
+    return (comb_index([piece in edges for piece in ep]) * 24
+            + perm_index([piece for piece in ep if piece in edges]))
+
+
+### Move tables ###
+# Each table is a list (one row per move in the given order) mapping coordinate -> coordinate.
+
+def twist_move_table(moves):
+    table = []
+    for move in moves:
+        m_cp, m_co, _, _ = CUBIE_MOVES[move]
+        row = []
+        for index in range(N_TWIST):
+            co = set_twist(index)
+            row.append(get_twist([(co[m_cp[i]] + m_co[i]) % 3 for i in range(8)]))
+        table.append(row)
+    return table
+
+def flip_move_table(moves):
+    table = []
+    for move in moves:
+        _, _, m_ep, m_eo = CUBIE_MOVES[move]
+        row = []
+        for index in range(N_FLIP):
+            eo = set_flip(index)
+            row.append(get_flip([(eo[m_ep[i]] + m_eo[i]) % 2 for i in range(12)]))
+        table.append(row)
+    return table
+
+def slice_move_table(moves):
+    table = []
+    for move in moves:
+        m_ep = CUBIE_MOVES[move][2]
+        row = []
+        for index in range(N_SLICE):
+            occupied = comb_from_index(index, 12, 4)
+            row.append(comb_index([occupied[m_ep[i]] for i in range(12)]))
+        table.append(row)
+    return table
+
+def m_slice_move_table(moves):
+    table = []
+    for move in moves:
+        m_ep = CUBIE_MOVES[move][2]
+        if any(m_ep[i] >= 8 for i in range(8)):
+            raise ValueError(f"{move} moves E-slice edges out of the E slice")
+        row = []
+        for index in range(N_M_SLICE):
+            occupied = comb_from_index(index, 8, 4)
+            row.append(comb_index([occupied[m_ep[i]] for i in range(8)]))
+        table.append(row)
+    return table
+
+def slice_perm_move_table(moves):
+    part_tables = []
+    for move in moves:
+        m_ep = CUBIE_MOVES[move][2]
+        parts = []
+        for slots in (M_SLICE_EDGES, S_SLICE_EDGES, E_SLICE_EDGES):
+            if any(m_ep[i] not in slots for i in slots):
+                raise ValueError(f"{move} moves edges between slices")
+            row = []
+            for index in range(24):
+                perm = dict(zip(slots, perm_from_index(index, 4)))
+                row.append(perm_index([perm[m_ep[i]] for i in slots]))
+            parts.append(row)
+        part_tables.append(parts)
+
+    table = []
+    for m_row, s_row, e_row in part_tables:
+        table.append([
+            (m_row[m] * 24 + s_row[s]) * 24 + e_row[e]
+            for m in range(24) for s in range(24) for e in range(24)
+        ])
+    return table
+
+def ud_edge_perm_move_table(moves):
+    table = []
+    for move in moves:
+        m_ep = CUBIE_MOVES[move][2]
+        if any(m_ep[i] >= 8 for i in range(8)):
+            raise ValueError(f"{move} moves E-slice edges out of the E slice")
+        table.append([
+            perm_index([perm[m_ep[i]] for i in range(8)])
+            for perm in (perm_from_index(index, 8) for index in range(N_UD_EDGE_PERM))
+        ])
+    return table
+
+def e_slice_perm_move_table(moves):
+    table = []
+    for move in moves:
+        m_ep = CUBIE_MOVES[move][2]
+        if any(m_ep[i] < 8 for i in range(8, 12)):
+            raise ValueError(f"{move} moves E-slice edges out of the E slice")
+        table.append([
+            perm_index([perm[m_ep[i] - 8] for i in range(8, 12)])
+            for perm in (perm_from_index(index, 4) for index in range(N_E_SLICE_PERM))
+        ])
+    return table
+
+def edge4_perm_move_table(moves):
+    """Move table of `get_edge4_perm`, which is the same whichever four edges it follows."""
+    table = []
+    for move in moves:
+        m_ep = CUBIE_MOVES[move][2]
+        row = []
+        for index in range(N_EDGE4_PERM):
+            order = iter(perm_from_index(index % 24, 4))
+            ep = [next(order) if slot else None for slot in comb_from_index(index // 24, 12, 4)]
+            ep = [ep[m_ep[i]] for i in range(12)]
+            row.append(comb_index([piece is not None for piece in ep]) * 24
+                       + perm_index([piece for piece in ep if piece is not None]))
+        table.append(row)
+    return table
+
+def ud_edge_perm_merge_table():
+    """
+    The U and D edge `get_edge4_perm` pair of each U/D edge permutation.
+
+    Returns:
+        list: u * N_EDGE4_PERM + d for every `get_ud_edge_perm` index.
+    """
+    table = []
+    for index in range(N_UD_EDGE_PERM):
+        ep = perm_from_index(index, 8) + list(E_SLICE_EDGES)
+        table.append(get_edge4_perm(ep, U_EDGES) * N_EDGE4_PERM + get_edge4_perm(ep, D_EDGES))
+    return table
+
+
+def _build_corner_perms():
+    """
+    Numbers all corner permutations in breadth-first order, starting with the
+    96 permutations reachable by half turns so that index < 96 means the corners
+    are in G3.
+    """
+    half_turns = [CUBIE_MOVES[m][0] for m in ["U2", "D2", "L2", "R2", "F2", "B2"]]
+    g2_turns = [CUBIE_MOVES[m][0] for m in ["U", "D", "L2", "R2", "F2", "B2"]]
+
+    perms = [tuple(range(8))]
+    index_of = {perms[0]: 0}
+    for turns in (half_turns, g2_turns):
+        queue = deque(perms)
+        while queue:
+            perm = queue.popleft()
+            for m_cp in turns:
+                new_perm = tuple(perm[i] for i in m_cp)
+                if new_perm not in index_of:
+                    index_of[new_perm] = len(perms)
+                    perms.append(new_perm)
+                    queue.append(new_perm)
+    return perms
+
+CORNER_PERMS = [tuple(perm) for perm in cached_table("corner_perms", "g3 then g2 bfs", _build_corner_perms)]
+CORNER_PERM_INDEX = {perm: i for i, perm in enumerate(CORNER_PERMS)}
+
+def get_corner_perm(cp):
+    return CORNER_PERM_INDEX[tuple(cp)]
+
+def corner_perm_move_table(moves):
+    table = []
+    for move in moves:
+        m_cp = CUBIE_MOVES[move][0]
+        table.append([CORNER_PERM_INDEX[tuple(perm[i] for i in m_cp)] for perm in CORNER_PERMS])
+    return table
@@ -0,0 +1,92 @@
+from array import array
+from functools import lru_cache
+from move_maps import MOVES, HTM_MOVES
+
+# A move sequence is held as an array('B') of codes: the index of each move in
+# HTM_MOVES, so code // 3 is the face (U D F B L R) and face // 2 its axis
+MOVE_CODES = {move: code for code, move in enumerate(HTM_MOVES)}
+# Clockwise quarter turns of each code % 3 ("", "'", "2") and back
+QUARTER_TURNS = (1, 3, 2)
+TURN_SUFFIX = {1: 0, 3: 1, 2: 2}
+
+
+def parse_moves(moves):
+    """
+    Parses a space separated sequence of face turns into move codes.
+
+    Raises:
+        ValueError: On anything that is not one of the 18 face turns.
+    """
+    codes = array("B")
+    for move in moves.split():
+        code = MOVE_CODES.get(move)
+        if code is None:
+            raise ValueError(f"Unknown move {move!r}, expected one of {HTM_MOVES}")
+        codes.append(code)
+    return codes
+
+def format_moves(codes):
+    return " ".join(HTM_MOVES[code] for code in codes)
+
+def invert_moves(codes):
+    """The codes of the inverse sequence: reversed, each turn undone."""
+    return array("B", (code - code % 3 + TURN_SUFFIX[4 - QUARTER_TURNS[code % 3]] for code in reversed(codes)))
+
+def simplify_moves(codes):
+    """
+    Merges every run of turns on one axis into at most one turn per face.
+
+    Turns of the same face add up (R R2 -> R'), opposite faces commute so a run
+    like U D U becomes U2 D, and a run that cancels out is dropped, which lets
+    the runs on either side of it merge in turn (R U U' R' -> nothing). Faces
+    come out in the canonical U-D, F-B, L-R order (see
+    coordinates.canonical_successors), so the result is a canonical sequence.
+
+    Returns:
+        array: The simplified codes.
+    """
+    runs = []  # [axis, [quarter turns of the axis's first face, of its second face]]
+    for code in codes:
+        face = code // 3
+        axis, side = face >> 1, face & 1
+        if runs and runs[-1][0] == axis:
+            turns = runs[-1][1]
+            turns[side] = (turns[side] + QUARTER_TURNS[code % 3]) % 4
+            if not any(turns):
+                runs.pop()
+        else:
+            turns = [0, 0]
+            turns[side] = QUARTER_TURNS[code % 3]
+            runs.append([axis, turns])
+
+    simplified = array("B")
+    for axis, turns in runs:
+        for side in (0, 1):
+            if turns[side]:
+                simplified.append((2 * axis + side) * 3 + TURN_SUFFIX[turns[side]])
+    return simplified
+
+def simplify(moves):
+    """String form of `simplify_moves`: "R U U' R2 D" -> "R' D"."""
+    return format_moves(simplify_moves(parse_moves(moves)))
+
+
+@lru_cache(maxsize=1024)
+def compose_moves(moves):
+    """
+    Composes a move sequence into a single facelet permutation.
+
+    Returns:
+        tuple: perm where the state after the sequence is [state[i] for i in perm],
+               see `apply_permutation`.
+    """
+    perm = list(range(54))
+    for move in moves.split():
+        old_perm = perm.copy()
+        for src, dst in MOVES[move].items():
+            perm[dst] = old_perm[src]
+    return tuple(perm)
+
+def apply_permutation(state, perm):
+    """Applies a composed sequence to a 54-facelet state in one pass."""
+    return [state[i] for i in perm]
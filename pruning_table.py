@@ -0,0 +1,212 @@
+# Entries hold the distance to the phase goal, 15 marks states beyond the generated depth
+UNKNOWN = 15
+MAX_DEPTH = 14
+
+# Number of known entries in each possible packed byte
+_KNOWN_PER_BYTE = bytes((b & 15 != UNKNOWN) + (b >> 4 != UNKNOWN) for b in range(256))
+
+
+class PruningTable:
+    """
+    Distance table indexed by a phase coordinate, packed two 4-bit entries per byte.
+
+    Offers the same `get(state, default)` lookup as the dict pruning tables built by
+    `gen_pruning_table`, so a state missing from the table yields the caller's default
+    lower bound. Hot search loops index `data` directly to skip the method call.
+    """
+    def __init__(self, size, data=None):
+        self.size = size
+        if data is None:
+            data = bytearray(b"\xff" * ((size + 1) // 2))
+        self.data = data
+
+    def get(self, state, default=None):
+        value = (self.data[state >> 1] >> ((state & 1) << 2)) & 15
+        return default if value == UNKNOWN else value
+
+    def __contains__(self, state):
+        return self.get(state) is not None
+
+    def __setitem__(self, state, value):
+        if not 0 <= value <= MAX_DEPTH:
+            raise ValueError(f"Pruning depth {value} does not fit in a 4-bit entry")
+        shift = (state & 1) << 2
+        byte = self.data[state >> 1]
+        self.data[state >> 1] = (byte & (0xF0 >> shift)) | (value << shift)
+
+    def count_known(self):
+        """Number of states with a stored distance."""
+        return sum(bytes(self.data).translate(_KNOWN_PER_BYTE))
+
+    def nbytes(self):
+        return len(self.data)
+
+
+def inverse_move_tables(move_tables):
+    """
+    Move tables of the inverse moves: row m maps each coordinate to the one move m takes there.
+
+    A breadth-first search from the solved states must expand the inverse moves to
+    find each state's distance *to* them. For move sets closed under inverses this
+    only reorders the rows, but G2's quarter turns U and D have no U' or D'.
+    """
+    inverse_tables = []
+    for table in move_tables:
+        inverse_table = []
+        for row in table:
+            inverse_row = [0] * len(row)
+            for state, new_state in enumerate(row):
+                inverse_row[new_state] = state
+            inverse_table.append(inverse_row)
+        inverse_tables.append(inverse_table)
+    return inverse_tables
+
+def gen_coord_pruning_table(solved_states, depth, move_tables, coord_size, size):
+    """
+    Breadth-first distance table over a phase coordinate space of `size` states.
+
+    Each entry is the number of moves from the state to the nearest solved state
+    (see `inverse_move_tables`). Generation stops at `depth` or once every
+    reachable state has been visited, so a depth of MAX_DEPTH yields the complete
+    (exact) table for every phase. Uses the vectorized generator when NumPy is
+    installed.
+    """
+    # Imported here rather than with the module: warm starts load every table from the
+    # cache and never need NumPy, which would add about 140ms to each of them
+    try:
+        import numpy as np
+    except ImportError:  # NumPy is optional; tables are then generated in pure Python
+        np = None
+    if np is not None:
+        return _gen_coord_pruning_table_np(np, solved_states, depth, move_tables, coord_size, size)
+
+    pruning_table = PruningTable(size)
+    data = pruning_table.data
+    previous_frontier = list(solved_states)
+    move_rows = list(zip(*inverse_move_tables(move_tables)))
+
+    for state in solved_states:
+        pruning_table[state] = 0
+
+    for i in range(1, depth + 1):
+        frontier = []
+        for state in previous_frontier:
+            x, y = divmod(state, coord_size)
+            for x_row, y_row in move_rows:
+                new_state = x_row[x] * coord_size + y_row[y]
+                if (data[new_state >> 1] >> ((new_state & 1) << 2)) & 15 == UNKNOWN:
+                    pruning_table[new_state] = i
+                    frontier.append(new_state)
+        if not frontier:
+            break
+        previous_frontier = frontier
+    return pruning_table
+
+def _gen_coord_pruning_table_np(np, solved_states, depth, move_tables, coord_size, size):
+    """
+    Vectorized `gen_coord_pruning_table`, building the identical table.
+
+    Each layer applies every move to the whole frontier as a gather on the move
+    tables. A byte per state tracks the distances found so far, so known children
+    are dropped and the next frontier is a scan for the new depth (cheaper than
+    sorting the children to remove duplicates). The bytes are packed into
+    nibbles at the end.
+    """
+    x_tables, y_tables = (np.array(table, dtype=np.int32) for table in move_tables)
+    # Invert each move's row, see `inverse_move_tables`
+    for tables in (x_tables, y_tables):
+        for row in tables:
+            row[row.copy()] = np.arange(len(row), dtype=np.int32)
+    depths = np.full(size, UNKNOWN, dtype=np.uint8)
+    frontier = np.unique(np.fromiter(solved_states, dtype=np.int32))
+    depths[frontier] = 0
+
+    for i in range(1, depth + 1):
+        x, y = np.divmod(frontier, coord_size)
+        for x_row, y_row in zip(x_tables, y_tables):
+            new_states = x_row[x] * coord_size + y_row[y]
+            depths[new_states[depths[new_states] == UNKNOWN]] = i
+        frontier = np.flatnonzero(depths == i).astype(np.int32)
+        if not len(frontier):
+            break
+
+    if size % 2:
+        depths = np.append(depths, np.uint8(UNKNOWN))
+    # Even states in the low nibble, odd states in the high nibble
+    return PruningTable(size, bytearray((depths[0::2] | (depths[1::2] << 4)).tobytes()))
+
+
+class StateSet:
+    """
+    Set of phase coordinates stored as a bitset over the coordinate space.
+
+    Membership is a single byte lookup, and iterating yields the members in order.
+    """
+    def __init__(self, size, data=None):
+        self.size = size
+        if data is None:
+            data = bytearray((size + 7) // 8)
+        self.data = data
+
+    @classmethod
+    def from_states(cls, size, states):
+        state_set = cls(size)
+        for state in states:
+            state_set.add(state)
+        return state_set
+
+    def add(self, state):
+        self.data[state >> 3] |= 1 << (state & 7)
+
+    def __contains__(self, state):
+        return (self.data[state >> 3] >> (state & 7)) & 1 == 1
+
+    def __iter__(self):
+        for i, byte in enumerate(self.data):
+            while byte:
+                low_bit = byte & -byte
+                yield (i << 3) + low_bit.bit_length() - 1
+                byte ^= low_bit
+
+    def __len__(self):
+        return sum(bin(byte).count("1") for byte in self.data if byte)
+
+    def nbytes(self):
+        return len(self.data)
+
+
+class SymPruningTable:
+    """
+    Pruning table whose y coordinate is reduced to its symmetry classes.
+
+    A state (x, y) is stored once per class of y: the lookup conjugates x by the
+    symmetry taking y to its class representative, which gives a symmetric state
+    at the same distance. Offers the same `get(state, default)` lookup as
+    `PruningTable`, which holds the reduced entries in `table`.
+    """
+    def __init__(self, table, coord_size, x_size, sym_class, sym_of, x_conj):
+        self.table = table
+        self.coord_size = coord_size
+        self.x_size = x_size
+        self.sym_class = sym_class
+        self.sym_of = sym_of
+        self.x_conj = x_conj
+
+    def reduced_index(self, x, y):
+        return self.sym_class[y] * self.x_size + self.x_conj[self.sym_of[y] * self.x_size + x]
+
+    def get(self, state, default=None):
+        x, y = divmod(state, self.coord_size)
+        return self.table.get(self.reduced_index(x, y), default)
+
+    def __contains__(self, state):
+        return self.get(state) is not None
+
+    def count_known(self):
+        """Number of reduced entries with a stored distance."""
+        return self.table.count_known()
+
+    def nbytes(self):
+        return self.table.nbytes() + sum(
+            memoryview(t).nbytes for t in (self.sym_class, self.sym_of, self.x_conj)
+        )
@@ -1,41 +1,161 @@
+from functools import lru_cache
+from operator import itemgetter
 from cubie_move_maps import MOVES
+from coordinates import (
+    canonical_successors, get_flip, get_twist, get_slice, get_m_slice, get_corner_perm,
+    get_slice_perm, perm_index, N_SLICE, N_CORNER_PERM, N_SLICE_PERM
+)
+from pruning_table import StateSet
+from table_cache import cached_table
+from move_sequence import simplify
+
+# Most states a breadth-first search stores before giving up
+BFS_MAX_STATES = 2_000_000
+HALF_TURNS = ["U2", "D2", "L2", "R2", "F2", "B2"]
+
+# A cube state is one tuple of 20 cubie codes: the 8 corner slots (piece * 3 + twist)
+# then the 12 edge slots (piece * 2 + flip), both codes below 24
+SOLVED_CUBIES = tuple(3 * i for i in range(8)) + tuple(2 * i for i in range(12))
+# Code of a cubie after adding an orientation change, by change
+CORNER_TWISTS = [tuple(c - c % 3 + (c + d) % 3 for c in range(24)) for d in range(3)]
+EDGE_FLIPS = [tuple(c ^ d for c in range(24)) for d in range(2)]
+NO_CHANGE = CORNER_TWISTS[0]
+
+
+class MoveTransform:
+    """
+    A move (or move sequence) compiled to act on a 20-code state in one pass.
+
+    Slot i of the new state is lookups[i][state[src[i]]]: the cubie comes from
+    slot src[i] and its lookup row adds the orientation change of that slot. The
+    permutation is one C-level itemgetter call and only the slots whose
+    orientation changes are looked up.
+    """
+    def __init__(self, src, lookups):
+        self.src = tuple(src)
+        self.lookups = tuple(lookups)
+        self._permute = itemgetter(*self.src)
+        self._reorient = tuple((i, lookup) for i, lookup in enumerate(self.lookups) if lookup != NO_CHANGE)
+
+    @classmethod
+    def from_move_def(cls, move_def):
+        """Compiles an entry of `cubie_move_maps.MOVES` ((dst, src) pairs and per-src orientation changes)."""
+        src = list(range(20))
+        lookups = [NO_CHANGE] * 20
+        for dst, j in move_def["corners"]:
+            src[dst] = j
+            lookups[dst] = CORNER_TWISTS[move_def.get("corner_orient", {}).get(j, 0)]
+        for dst, j in move_def["edges"]:
+            src[8 + dst] = 8 + j
+            lookups[8 + dst] = EDGE_FLIPS[move_def.get("edge_flip", {}).get(j, 0)]
+        return cls(src, lookups)
+
+    def apply(self, state):
+        state = self._permute(state)
+        if not self._reorient:
+            return state
+        state = list(state)
+        for i, lookup in self._reorient:
+            state[i] = lookup[state[i]]
+        return tuple(state)
+
+    def then(self, other):
+        """The transform applying this one and then `other`."""
+        return MoveTransform(
+            [self.src[j] for j in other.src],
+            [tuple(other.lookups[i][self.lookups[j][c]] for c in range(24)) for i, j in enumerate(other.src)]
+        )
+
+IDENTITY = MoveTransform(range(20), [NO_CHANGE] * 20)
+
+# Every move of `cubie_move_maps.MOVES`, compiled once
+COMPILED_MOVES = {move: MoveTransform.from_move_def(move_def) for move, move_def in MOVES.items()}
+
+@lru_cache(maxsize=1024)
+def compile_moves(moves):
+    """Compiles a move sequence into a single transform."""
+    transform = IDENTITY
+    for move in moves.split(" "):
+        if move:
+            transform = transform.then(COMPILED_MOVES[move])
+    return transform
+
+@lru_cache(maxsize=None)
+def compiled_move_set(moves):
+    """Canonical successors, compiled transforms and index of each move of a move set (tuple)."""
+    return canonical_successors(moves), [COMPILED_MOVES[move] for move in moves], \
+        {move: i for i, move in enumerate(moves)}
+
+
+def _build_g3_corner_table():
+    # Breadth-first over bare corner permutations; only the first 8 source slots matter
+    sources = [COMPILED_MOVES[move].src[:8] for move in HALF_TURNS]
+    solved = tuple(range(8))
+    seen = {solved}
+    frontier = [solved]
+    while frontier:
+        new_frontier = []
+        for cp in frontier:
+            for src in sources:
+                new_cp = tuple(cp[j] for j in src)
+                if new_cp not in seen:
+                    seen.add(new_cp)
+                    new_frontier.append(new_cp)
+        frontier = new_frontier
+    return StateSet.from_states(N_CORNER_PERM, (perm_index(cp) for cp in seen))
+
+@lru_cache(maxsize=None)
+def g3_corner_table():
+    """
+    The 96 corner permutations reachable with half turns, as a bitset over the
+    40320 permutation ranks (`coordinates.perm_index`).
+
+    Built once and kept in the table cache; every solver in the process shares it.
+    """
+    return cached_table("g3_corner_perm_ranks", ("corner perm rank", HALF_TURNS), _build_g3_corner_table,
+                        mapped=True)
+
 
 class Cube:
     def __init__(self):
-        self.corners = [(i, 0) for i in range(8)]   # (piece, orientation)
-        self.edges = [(i, 0) for i in range (12)]   # (piece, flip)
+        self.state = SOLVED_CUBIES
         self.facelet = "UUUUUUUUULLLLLLLLLFFFFFFFFFRRRRRRRRRBBBBBBBBBDDDDDDDDD"
 
+    @property
+    def corners(self):
+        """(piece, orientation) of each corner slot."""
+        return [divmod(c, 3) for c in self.state[:8]]
+
+    @corners.setter
+    def corners(self, corners):
+        self.state = tuple(3 * piece + orient for piece, orient in corners) + self.state[8:]
+
+    @property
+    def edges(self):
+        """(piece, flip) of each edge slot."""
+        return [divmod(c, 2) for c in self.state[8:]]
+
+    @edges.setter
+    def edges(self, edges):
+        self.state = self.state[:8] + tuple(2 * piece + flip for piece, flip in edges)
+
     def copy(self):
         new_cube = Cube()
-        new_cube.corners = list(self.corners)
-        new_cube.edges = list(self.edges)
+        new_cube.state = self.state
         return new_cube
-    
+
     def rotate(self, moves):
         for move in moves.split(" "):
             if move:
-                move_def = MOVES[move]
-                self.apply_corner_move(move_def["corners"], move_def.get("corner_orient", {}))
-                self.apply_edge_move(move_def["edges"], move_def.get("edge_flip", {}))
-
-    def apply_corner_move(self, perm, twists):
-        old = self.corners.copy()
-        for i, j in perm:
-            piece, orient = old[j]
-            twist = twists.get(j, 0)
-            self.corners[i] = (piece, (orient + twist) % 3)
-    
-    def apply_edge_move(self, perm, flips):
-        old = self.edges.copy()
-        for i, j in perm:
-            piece, flip = old[j]
-            extra = flips.get(j, 0)
-            self.edges[i] = (piece, (flip + extra) % 2)
+                self.state = COMPILED_MOVES[move].apply(self.state)
+
+    def apply(self, transform):
+        """Applies a compiled move or move sequence (see `compile_moves`)."""
+        self.state = transform.apply(self.state)
 
     def is_solved(self):
-        return all(p == i and o == 0 for i, (p, o) in enumerate(self.corners)) and all(p == i and f == 0 for i, (p, f) in enumerate(self.edges))
-    
+        return self.state == SOLVED_CUBIES
+
     def display_cube(self):
         """Prints the cube in 2D net layout to the console with color emojis."""
         def cubie_to_facelets(cubie):
@@ -156,147 +276,216 @@ class Cube:
         print()
 
 class Thistlethwaite_Solver:
-    def __init__(self, cube):
-        self.MOVES_G0 = MOVES#["U", "D", "F", "B", "L", "R"]
-        self.MOVES_G1 = ["U", "D", "F2", "B2", "L", "L'", "L2", "R", "R'", "R2"]
-        self.MOVES_G2 = ["U2", "D2", "F2", "B2", "L", "R"]
-        self.MOVES_G3 = ["U2", "D2", "L2", "R2", "F2", "B2"]
+    """
+    Thistlethwaite solver working on the cubie model.
+
+    The phases are those of the facelet solver (rubiks_cube_solver.py): the same
+    move sets and goal groups, and IDA* bounded by the same pruning tables, looked
+    up with the phase coordinates of the cubie state. Searches key states by a
+    packed integer and never hold more than `max_states` states, so memory stays
+    bounded whatever the scramble.
+    """
+    def __init__(self, cube, max_states=BFS_MAX_STATES):
+        self.MOVES_G0 = list(MOVES)
+        self.MOVES_G1 = ["U", "U'", "U2", "D", "D'", "D2", "L", "L'", "L2", "R", "R'", "R2", "F2", "B2"]
+        self.MOVES_G2 = ["U", "D", "L2", "R2", "F2", "B2"]
+        self.MOVES_G3 = list(HALF_TURNS)
         self.cube = cube.copy()
+        self.max_states = max_states
         self.solution = []
-        self.g3_corner_table = self.generate_g3_corner_table()
-    
+        self.g3_corner_table = g3_corner_table()
+
     def in_g1(self, cube):
-        return all(f == 0 for _, f in cube.edges)  
+        return not any(c & 1 for c in cube.state[8:])
 
     def in_g2(self, cube):
-        return (self.in_g1(cube) and all(o == 0 for _, o in cube.corners) and self.check_E_slice(cube))
+        return (self.in_g1(cube) and all(c % 3 == 0 for c in cube.state[:8]) and self.check_E_slice(cube))
 
     def in_g3(self, cube):
         return (
             self.in_g2(cube) and
             self.corner_permutation_key(cube) in self.g3_corner_table and
-            self.check_UD_edges(cube)
+            self.check_M_slice(cube)
         )
 
-
     def is_solved(self, cube):
         return cube.is_solved()
-    
+
     def check_E_slice(self, cube):
         e_slice_ids = [8, 9, 10, 11]
-        return all(cube.edges[i][0] in e_slice_ids for i in range(8, 12))
-    
-    def check_UD_edges(self, cube):
-        UD_EDGES = [0,1,2,3,4,5,6,7]
-        # Check current edges in U and D positions are U and D edges
-        for i in UD_EDGES:
-            if cube.edges[i][0] not in UD_EDGES:
-                return False
-        return True
-    
-    def generate_g3_corner_table(self):
-        from collections import deque
-
-        visited = set()
-        queue = deque()
+        return all(cube.state[8 + i] >> 1 in e_slice_ids for i in range(8, 12))
 
-        # Start from solved cube
-        solved = Cube()
-        start_key = self.corner_permutation_key(solved)
-        visited.add(start_key)
-        queue.append(solved)
+    def check_M_slice(self, cube):
+        # With the E slice home, the M-slice edges (UF, UB, DF, DB) in M slots puts
+        # the S-slice edges in S slots too
+        m_slice_ids = [1, 3, 5, 7]
+        return all(cube.state[8 + i] >> 1 in m_slice_ids for i in m_slice_ids)
 
-        while queue:
-            cube = queue.popleft()
-            for move in self.MOVES_G3:
-                new_cube = cube.copy()
-                new_cube.rotate(move)
-                key = self.corner_permutation_key(new_cube)
-                if key not in visited:
-                    visited.add(key)
-                    queue.append(new_cube)
-
-        return visited
-    
     def corner_permutation_key(self, cube):
-        return tuple(p for (p, _) in cube.corners)
+        """Rank of the corner permutation, the index into `g3_corner_table`."""
+        return perm_index([c // 3 for c in cube.state[:8]])
 
-    
     def cube_key(self, cube):
-        # Could be corners + edges for uniqueness
-        return str(cube.corners) + str(cube.edges)
-
-    def dfs(self, cube, goal_test, move_set, solution, depth_remaining, visited):
-        if goal_test(cube):
-            return solution
+        """Packs the whole state into one int, 5 bits per cubie code."""
+        key = 0
+        for c in cube.state:
+            key = (key << 5) | c
+        return key
+
+    def phase_heuristics(self):
+        """
+        Lower bounds on the remaining moves of each phase, read from the facelet
+        solver's pruning tables (loaded with rubiks_cube_solver on first use).
+        """
+        import rubiks_cube_solver as tables
+
+        def lookup(table, depth):
+            default = depth + 1
+            return lambda state: table.get(state, default)
+
+        g0 = lookup(tables.g0_table, tables.g0_depth)
+        g1 = lookup(tables.g1_table, tables.g1_depth)
+        g2 = lookup(tables.g2_table, tables.g2_depth)
+        g3 = lookup(tables.g3_table, tables.g3_depth)
+        return [
+            lambda cube: g0(get_flip([c & 1 for c in cube.state[8:]])),
+            lambda cube: g1(get_twist([c % 3 for c in cube.state[:8]]) * N_SLICE
+                            + get_slice([c >> 1 for c in cube.state[8:]])),
+            lambda cube: g2(get_m_slice([c >> 1 for c in cube.state[8:]]) * N_CORNER_PERM
+                            + get_corner_perm([c // 3 for c in cube.state[:8]])),
+            lambda cube: g3(get_corner_perm([c // 3 for c in cube.state[:8]]) * N_SLICE_PERM
+                            + get_slice_perm([c >> 1 for c in cube.state[8:]])),
+        ]
+
+    def dfs(self, cube, goal_test, move_set, path, depth_remaining, heuristic=None):
+        """
+        Depth-first search for a goal within depth_remaining moves of `cube`.
+
+        Only canonical move sequences are walked (see coordinates.canonical_successors)
+        and, with a heuristic, branches whose lower bound exceeds the moves left are
+        cut. The path is one list extended and shrunk in place, so memory is
+        proportional to the depth.
+        """
+        if heuristic is None:
+            if goal_test(cube):
+                return list(path)
+        else:
+            lower_bound = heuristic(cube)
+            # The tables give 0 only in the goal group, so other states skip the test
+            if lower_bound == 0 and goal_test(cube):
+                return list(path)
+            if lower_bound > depth_remaining:
+                return None
         if depth_remaining == 0:
             return None
 
-        for move in move_set:
+        successors, transforms, move_index = compiled_move_set(tuple(move_set))
+        prev = move_index[path[-1]] if path else len(move_set)
+        for i in successors[prev]:
             next_cube = cube.copy()
-            next_cube.rotate(move)
-            key = self.cube_key(next_cube)
-
-            if key not in visited:
-                visited.add(key)
-                result = self.dfs(next_cube, goal_test, move_set, solution + [move], depth_remaining - 1, visited)
-                if result is not None:
-                    return result
+            next_cube.apply(transforms[i])
+            path.append(move_set[i])
+            result = self.dfs(next_cube, goal_test, move_set, path, depth_remaining - 1, heuristic)
+            path.pop()
+            if result is not None:
+                return result
         return None
 
-
-    def iddfs(self, goal_test, move_set, max_depth=10):
-        for depth in range(max_depth + 1):
-            visited = set()
-            print(f"Trying depth {depth}...")
-            result = self.dfs(self.cube.copy(), goal_test, move_set, [], depth, visited)
+    def iddfs(self, goal_test, move_set, max_depth=10, heuristic=None):
+        """
+        Iterative deepening (IDA* with a heuristic) from the solver's cube.
+
+        Returns:
+            list: The moves of the first shortest solution found, or None if there
+                  is none within max_depth.
+        """
+        start = heuristic(self.cube) if heuristic is not None else 0
+        for depth in range(start, max_depth + 1):
+            result = self.dfs(self.cube.copy(), goal_test, move_set, [], depth, heuristic)
             if result is not None:
                 return result
-        return []  # No solution found within depth
+        return None
 
-    
     def bfs(self, goal_test, move_set):
+        """
+        Breadth-first search from the solver's cube for a shortest solution.
+
+        Each state seen is stored once, as its packed key mapped to its parent's key
+        and the move between them, and the path is rebuilt from the goal.
+
+        Returns:
+            list: The moves of a shortest solution, or None if the search saw
+                  `max_states` states without reaching the goal.
+        """
         from collections import deque
-        visited = set()
-        queue = deque()
-        queue.append((self.cube.copy(), []))
-        visited.add(self.cube_key(self.cube))
+
+        transforms = [COMPILED_MOVES[move] for move in move_set]
+        start_key = self.cube_key(self.cube)
+        parents = {start_key: None}
+        queue = deque([self.cube.copy()])
 
         while queue:
-            cube, path = queue.popleft()
+            cube = queue.popleft()
             if goal_test(cube):
-                return path
-
-            for move in move_set:
+                path = []
+                key = self.cube_key(cube)
+                while parents[key] is not None:
+                    key, move = parents[key]
+                    path.append(move)
+                return path[::-1]
+
+            cube_key = self.cube_key(cube)
+            for move, transform in zip(move_set, transforms):
                 next_cube = cube.copy()
-                next_cube.rotate(move)
+                next_cube.apply(transform)
                 key = self.cube_key(next_cube)
-                if key not in visited:
-                    visited.add(key)
-                    queue.append((next_cube, path + [move]))
-
-        return []  # Should not reach here if implemented correctly
-
+                if key not in parents:
+                    if len(parents) >= self.max_states:
+                        return None
+                    parents[key] = (cube_key, move)
+                    queue.append(next_cube)
 
+        return None
 
-    def solve(self, use_dfs=False, max_depth=2):
+    def solve(self, use_bfs=False, max_depths=None, verbose=False):
+        """
+        Solves the cube phase by phase, adding each phase's moves to `self.solution`.
+
+        Args:
+            use_bfs (bool): Search each phase breadth first instead of with IDA*; only
+                practical for the short later phases.
+            max_depths (tuple, optional): Longest solution searched for in each phase,
+                by default the facelet solver's PHASE_DEPTH_LIMITS.
+            verbose (bool): Print and display the cube after each phase.
+
+        Returns:
+            list: The full solution with the turns that cancel across phase boundaries
+                  merged, or None if a phase failed.
+        """
+        movesets = [self.MOVES_G0, self.MOVES_G1, self.MOVES_G2, self.MOVES_G3]
+        goal_tests = [self.in_g1, self.in_g2, self.in_g3, self.is_solved]
+        heuristics = None if use_bfs else self.phase_heuristics()
+        if max_depths is None:
+            from rubiks_cube_solver import PHASE_DEPTH_LIMITS as max_depths
         for phase in range(4):
-            moveset = [self.MOVES_G0, self.MOVES_G1, self.MOVES_G2, self.MOVES_G3][phase]
-            goal_test = [self.in_g1, self.in_g2, self.in_g3, self.is_solved][phase]
-
-            if use_dfs:
-                phase_solution = self.iddfs(goal_test, moveset, max_depth)
+            if use_bfs:
+                phase_solution = self.bfs(goal_tests[phase], movesets[phase])
             else:
-                phase_solution = self.bfs(goal_test, moveset)
+                phase_solution = self.iddfs(goal_tests[phase], movesets[phase], max_depths[phase],
+                                            heuristics[phase])
+
+            if phase_solution is None:
+                if verbose:
+                    print(f"Phase G{phase+1} failed to solve.")
+                return None
 
-            if not phase_solution:
-                print(f"Phase G{phase+1} failed to solve.")
-                break
-            
             self.solution.extend(phase_solution)
             self.cube.rotate(" ".join(phase_solution))
-            print(f"G{phase+1} complete ({len(phase_solution)} moves): {' '.join(phase_solution)}")
-            self.cube.display_cube()
+            if verbose:
+                print(f"G{phase+1} complete ({len(phase_solution)} moves): {' '.join(phase_solution)}")
+                self.cube.display_cube()
+        self.solution = simplify(" ".join(self.solution)).split()
+        return self.solution
 
 
 
@@ -306,8 +495,8 @@ def main():
     cube.display_cube()
 
     solver = Thistlethwaite_Solver(cube)
-    solver.solve()
-    print("Solution:", solver.solution)
+    solver.solve(verbose=True)
+    print("Solution:", " ".join(solver.solution))
 
     
 
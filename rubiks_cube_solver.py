@@ -1,7 +1,32 @@
 from move_maps import MOVES
+from coordinates import (
+    facelets_to_cubie, get_flip, get_twist, get_slice, get_corner_perm, get_m_slice,
+    get_slice_perm, flip_move_table, twist_move_table, slice_move_table,
+    corner_perm_move_table, m_slice_move_table, slice_perm_move_table, canonical_successors,
+    N_FLIP, N_TWIST, N_SLICE, N_CORNER_PERM, N_M_SLICE, N_SLICE_PERM, N_G3_CORNER_PERM
+)
+from table_cache import cached_table
+from shared_tables import shared_table, unlink_table
+from pruning_table import (
+    PruningTable, SymPruningTable, UNKNOWN, MAX_DEPTH, gen_coord_pruning_table, inverse_move_tables
+)
+from symmetry import (
+    symmetries_preserving, sym_reduce, class_stabilizers, twist_conj_table, slice_conj_table,
+    m_slice_conj_table, corner_perm_conj_table
+)
+from solution_cache import PhaseMemo
+from search_stats import SolveStats
+from move_sequence import simplify
+from two_phase import solve_two_phase, two_phase_solutions, load_tables as load_two_phase_tables
 from timeit import default_timer
+from functools import lru_cache, partial
+from itertools import islice
+from contextlib import contextmanager, nullcontext
+import multiprocessing
+import queue
+import gc
+import os
 import random
-import matplotlib.pyplot as plt
 
 class Cube:
     def __init__(self, state=None, is_if=False):
@@ -106,12 +131,23 @@ class Cube:
         print()
 
 
+def allowed_moves(solver, last_move):
+    """Moves of the solver's move set that may canonically follow `last_move` (None at the start)."""
+    prev = len(solver.moves) if last_move is None else solver.move_index[last_move]
+    return [solver.moves[i] for i in solver.successors[prev]]
+
 class Solver:
-    def __init__(self, is_solved_fn, moves, pruning_table, pruning_depth):
+    def __init__(self, is_solved_fn, moves, pruning_table, pruning_depth, move_tables=None, coord_size=1):
         self.is_solved_fn = is_solved_fn
         self.moves = moves
         self.pruning_table = pruning_table
         self.pruning_depth = pruning_depth
+        # Coordinate solvers search on (x, y) coordinate pairs: move_tables holds the
+        # x and y move tables (one row per move) and states are keyed by x * coord_size + y
+        self.move_tables = move_tables
+        self.coord_size = coord_size
+        self.move_index = {move: i for i, move in enumerate(moves)}
+        self.successors = canonical_successors(tuple(moves))
 
     def is_solved(self, cube):
         return self.is_solved_fn(cube)
@@ -123,7 +159,8 @@ def solve_dfs(solver, cube, solution, depth_remaining):
     if depth_remaining == 0:
         return None
 
-    for move in solver.moves:
+    last_move = solution.rsplit(" ", 1)[-1] or None
+    for move in allowed_moves(solver, last_move):
         new_cube = cube.copy()
         new_cube.rotate(move)
         result = solve_dfs(
@@ -240,37 +277,242 @@ def gen_pruning_table(solved_states, depth, moveset):
         #print(f"Depth {i} - States {len(pruning_table)}")
     return pruning_table
 
-def solve_dfs_with_pruning(solver, cube, solution, depth_remaining):
+def solve_dfs_with_pruning(solver, cube, solution, depth_remaining, stats=None):
+    if stats is not None:
+        stats.nodes += 1
     if solver.is_solved(cube):
         return " ".join(solution)
     if depth_remaining == 0:
         return None
 
     # Mask the cube for pruning table lookup
-    lower_bound = solver.pruning_table.get("".join(cube.state), solver.pruning_depth + 1)
+    lower_bound = solver.pruning_table.get("".join(cube.state))
+    if lower_bound is None:
+        lower_bound = solver.pruning_depth + 1
+        if stats is not None:
+            stats.table_misses += 1
     if lower_bound > depth_remaining:
+        if stats is not None:
+            stats.prunes += 1
         return None
 
-    for move in solver.moves:
-        if solution and move[0] == solution[-1][0]:
-            continue  # Skip same-face moves
+    for move in allowed_moves(solver, solution[-1] if solution else None):
         new_cube = cube.copy()
         new_cube.rotate(move)
         solution.append(move)
-        result = solve_dfs_with_pruning(solver, new_cube, solution, depth_remaining - 1)
+        result = solve_dfs_with_pruning(solver, new_cube, solution, depth_remaining - 1, stats)
         if result is not None:
             return result
         solution.pop()
     return None
 
-def solve_iidfs_pruning(solver, cube, depth_limit):
+def solve_iidfs_pruning(solver, cube, depth_limit, stats=None):
+    """
+    Args:
+        stats (SearchStats, optional): Counters the search adds to.
+    """
     for depth in range(1, depth_limit + 1):
+        if stats is not None:
+            stats.iteration(depth)
         solution = []
-        result = solve_dfs_with_pruning(solver, cube.copy(), solution, depth)
+        result = solve_dfs_with_pruning(solver, cube.copy(), solution, depth, stats)
         if result is not None:
             return result
     return None
 
+def gen_sym_pruning_table(solved_states, depth, move_tables, coord_size, lookup, y_conj):
+    """
+    Breadth-first distance table over the symmetry classes of a SymPruningTable.
+
+    Like `gen_coord_pruning_table` it expands the inverse moves, so entries are
+    distances to the solved states. Each class entry stands for the state (x, representative). A new entry also
+    fills the entries its representative's own symmetries map it to, so a state
+    finds its distance whichever of those symmetries its lookup goes through.
+
+    Args:
+        lookup (SymPruningTable): Class and conjugation tables of the phase.
+        y_conj: Conjugation table of the y coordinate (see symmetry.py).
+    """
+    x_size, x_conj = lookup.x_size, lookup.x_conj
+    num_syms = len(x_conj) // x_size
+    reps, stabilizers = class_stabilizers(y_conj, coord_size, lookup.sym_class, num_syms)
+    pruning_table = PruningTable(len(reps) * x_size)
+    data = pruning_table.data
+    move_rows = list(zip(*inverse_move_tables(move_tables)))
+
+    def visit(x, y, i, frontier):
+        c = lookup.sym_class[y]
+        x = x_conj[lookup.sym_of[y] * x_size + x]
+        base = c * x_size
+        if (data[(base + x) >> 1] >> (((base + x) & 1) << 2)) & 15 != UNKNOWN:
+            return
+        for k in stabilizers[c]:
+            index = base + x_conj[k * x_size + x]
+            if (data[index >> 1] >> ((index & 1) << 2)) & 15 == UNKNOWN:
+                pruning_table[index] = i
+                frontier.append(index)
+
+    previous_frontier = []
+    for state in solved_states:
+        x, y = divmod(state, coord_size)
+        visit(x, y, 0, previous_frontier)
+
+    for i in range(1, depth + 1):
+        frontier = []
+        for index in previous_frontier:
+            c, x = divmod(index, x_size)
+            y = reps[c]
+            for x_row, y_row in move_rows:
+                visit(x_row[x], y_row[y], i, frontier)
+        if not frontier:
+            break
+        previous_frontier = frontier
+    return pruning_table
+
+# Nodes searched between deadline checks
+DEADLINE_CHECK_INTERVAL = 1024
+
+def ida_coord_solutions(solver, coords, depth_limit, deadline=None, stats=None):
+    """
+    Iterative IDA* over a coordinate solver, yielding every solution in order of length.
+
+    An explicit move stack walks the tree over one preallocated buffer of
+    per-depth coordinates, so making and unmaking a move is just moving the
+    depth pointer. Each iteration raises the bound straight to the smallest
+    f = depth + lower bound that exceeded it, so with an admissible table the
+    solutions come shortest first. Goal states are not searched past, so no
+    solution has a shorter one as its prefix.
+
+    Args:
+        solver (Solver): Coordinate solver (move_tables and coord_size set).
+        coords (tuple): (x, y) coordinates of the start state.
+        depth_limit (int): Longest solution to search for.
+        deadline (float, optional): default_timer() value at which to stop searching.
+        stats (SearchStats, optional): Counters the search adds to.
+
+    Yields:
+        str: Solutions (canonical move sequences), each once; just "" if the
+             start state is already solved.
+    """
+    moves = solver.moves
+    successors = solver.successors
+    x_table, y_table = solver.move_tables
+    coord_size = solver.coord_size
+    pruning_table = solver.pruning_table
+    # Packed tables are read inline, others (symmetry-reduced tables) through get()
+    data = pruning_table.data if isinstance(pruning_table, PruningTable) else None
+    default_bound = solver.pruning_depth + 1
+    is_solved = solver.is_solved_fn
+
+    x, y = coords
+    state = x * coord_size + y
+    if is_solved(state):
+        yield ""
+        return
+    bound = pruning_table.get(state, default_bound)
+
+    xs = [x] * (depth_limit + 1)
+    ys = [y] * (depth_limit + 1)
+    # Canonical successors still to try at each depth and how far through them we are
+    candidates = [successors[-1]] * (depth_limit + 1)
+    next_move = [0] * (depth_limit + 1)
+    path = [0] * depth_limit
+    found = set()
+    # Counted locally and added to stats whenever the search pauses or ends
+    nodes = misses = prunes = 0
+
+    while bound <= depth_limit:
+        if stats is not None:
+            stats.iteration(bound)
+        next_bound = depth_limit + 1
+        depth = 0
+        next_move[0] = 0
+        while depth >= 0:
+            i = next_move[depth]
+            if i == len(candidates[depth]):
+                depth -= 1  # Unmake the move that led here
+                continue
+            next_move[depth] = i + 1
+            m = candidates[depth][i]
+
+            nodes += 1
+            if deadline is not None and nodes % DEADLINE_CHECK_INTERVAL == 0 and default_timer() > deadline:
+                if stats is not None:
+                    stats.add(nodes, misses, prunes)
+                return
+
+            x = x_table[m][xs[depth]]
+            y = y_table[m][ys[depth]]
+            state = x * coord_size + y
+            if data is None:
+                lower_bound = pruning_table.get(state, default_bound)
+                if lower_bound == default_bound:
+                    misses += 1
+            else:
+                # Inlined PruningTable.get
+                lower_bound = (data[state >> 1] >> ((state & 1) << 2)) & 15
+                if lower_bound == UNKNOWN:
+                    lower_bound = default_bound
+                    misses += 1
+            f = depth + 1 + lower_bound
+            if f > bound:
+                prunes += 1
+                if f < next_bound:
+                    next_bound = f
+                continue
+            # An admissible table only gives 0 to goal states, so the goal test can wait
+            if lower_bound == 0 and is_solved(state):
+                path[depth] = m
+                solution = " ".join(moves[i] for i in path[:depth + 1])
+                # Later iterations walk the solutions of earlier ones again
+                if solution not in found:
+                    found.add(solution)
+                    if stats is not None:
+                        stats.add(nodes, misses, prunes)
+                        nodes = misses = prunes = 0
+                    yield solution
+                    # Dense solutions can keep the node count below a check interval
+                    if deadline is not None and default_timer() > deadline:
+                        return
+                continue
+
+            path[depth] = m
+            depth += 1
+            xs[depth] = x
+            ys[depth] = y
+            candidates[depth] = successors[m]
+            next_move[depth] = 0
+        bound = next_bound
+    if stats is not None:
+        stats.add(nodes, misses, prunes)
+
+def solve_ida_coord(solver, coords, depth_limit):
+    """
+    Returns:
+        str: The first shortest solution found by `ida_coord_solutions`, "" if already
+             solved, or None if there is none within depth_limit.
+    """
+    return next(ida_coord_solutions(solver, coords, depth_limit), None)
+
+def g0_coords(cube):
+    cp, co, ep, eo = facelets_to_cubie(cube.state)
+    return get_flip(eo), 0
+
+def g1_coords(cube):
+    cp, co, ep, eo = facelets_to_cubie(cube.state)
+    return get_twist(co), get_slice(ep)
+
+def g2_coords(cube):
+    cp, co, ep, eo = facelets_to_cubie(cube.state)
+    return get_m_slice(ep), get_corner_perm(cp)
+
+def g3_coords(cube):
+    cp, co, ep, eo = facelets_to_cubie(cube.state)
+    return get_corner_perm(cp), get_slice_perm(ep)
+
+def coord_index(coords, coord_size):
+    return coords[0] * coord_size + coords[1]
+
 def fb_is_solved(cube):
     fb_pieces = [12,13,14,15,16,17,21,24,41,44,45,48,51]
     return all(cube.state[i] == cube.index_facelet_cube(i) for i in fb_pieces)
@@ -293,13 +535,13 @@ def g3_is_solved(cube):
     solved_cube = 'UUUUUUUUULLLLLLLLLFFFFFFFFFRRRRRRRRRBBBBBBBBBDDDDDDDDD'
     return "".join(cube.state) == solved_cube
 
-def get_random_scramble(moveset, k=20):
+def get_random_scramble(moveset, k=20, rng=random):
     scramble = []
     last_move = moveset[0]
 
     for _ in range(k):
         while True:
-            move = random.choice(moveset)
+            move = rng.choice(moveset)
             if move[0] != last_move[0]:
                 scramble.append(move)
                 last_move = move
@@ -314,116 +556,576 @@ g3_moves = ["U2", "D2", "L2", "R2", "F2", "B2"]
 g0_depth = 7
 g1_depth = 6
 g2_depth = 6
-g3_depth = 6
+# The G3 phase's table is always complete: it is small (663552 reachable states) and,
+# half turns being their own inverses, exact, so IDA* walks straight down it to an
+# optimal solution. The few depth-15 states read back as the default bound of 15.
+g3_depth = MAX_DEPTH
+
+# Complete distance tables make every lookup exact. They take a while to build the
+# first time and are then served from the table cache.
+full_depth_tables = os.environ.get("RUBIKS_FULL_DEPTH_TABLES") == "1"
+if full_depth_tables:
+    g0_depth = g1_depth = g2_depth = MAX_DEPTH
+
+# Hold the pruning tables in named shared memory so every solver process on the host
+# maps one physical copy (see shared_tables.py). The process that publishes the blocks
+# removes them when it exits; `python shared_tables.py` removes those of killed processes.
+shared_tables = os.environ.get("RUBIKS_SHARED_TABLES") == "1"
+
+# Store the G1 and G2 tables once per symmetry class (about 6-8x smaller, slightly
+# slower lookups), leaving room for exact full-depth tables (see symmetry.py)
+symmetry_tables = os.environ.get("RUBIKS_SYMMETRY_TABLES") == "1"
+
+def pruning_table_source(name, key, build_fn):
+    if shared_tables:
+        return shared_table(name, key, build_fn)
+    # Query the cache file through a memory map: loading is O(1) and pages are read lazily
+    # (RUBIKS_VERIFY_TABLES=1 checksums each file on load, reading it all)
+    return cached_table(name, key, build_fn, mapped=True)
+
+def sym_pruning_table_source(name, key, moves, coord_size, x_size, y_conj_fn, x_conj_fn, build_fn):
+    """
+    Loads a symmetry-reduced pruning table along with its class and conjugation tables.
+
+    The y coordinate is reduced under the symmetries that map `moves` onto itself,
+    which keep every distance in the phase unchanged.
+
+    Args:
+        y_conj_fn, x_conj_fn (callable): Build the coordinates' conjugation tables
+            for a list of symmetries.
+        build_fn (callable): build_fn(lookup, y_conj) returns the reduced PruningTable.
+    """
+    syms = symmetries_preserving(moves)
+    y_conj = lru_cache(maxsize=None)(lambda: y_conj_fn(syms))
+    reduction = lru_cache(maxsize=None)(lambda: sym_reduce(y_conj(), coord_size, len(syms)))
+    lookup = SymPruningTable(
+        None, coord_size, x_size,
+        cached_table(f"{name}_sym_class", key, lambda: reduction()[0], mapped=True),
+        cached_table(f"{name}_sym_of", key, lambda: reduction()[1], mapped=True),
+        cached_table(f"{name}_x_conj", key, lambda: x_conj_fn(syms), mapped=True)
+    )
+    lookup.table = pruning_table_source(name, key, lambda: build_fn(lookup, y_conj()))
+    return lookup
+
+# Cache key (coordinate, move set, depth) of each phase pruning table
+pruning_table_keys = {
+    "g0_table": ("flip", g0_moves, g0_depth),
+    "g1_table": ("twist x slice", g1_moves, g1_depth),
+    "g2_table": ("m slice x corner perm", g2_moves, g2_depth),
+    "g3_table": ("corner perm x slice perm", g3_moves, g3_depth),
+}
+if symmetry_tables:
+    pruning_table_keys["g1_table"] = ("twist x slice classes", g1_moves, g1_depth)
+    pruning_table_keys["g2_table"] = ("m slice x corner perm classes", g2_moves, g2_depth)
 
-# Precompute solved reference cube
-solved_if_cube = Cube([i for i in range(54)])
 solved_cube = Cube()
 
+# Move and pruning tables are loaded from the on-disk cache (table_cache.py) and
+# only rebuilt when their cache file is missing or was built with a different key
+
 # G0 pruning table (EO)
-eo_pieces = [1,3,5,7,21,23,39,41,46,48,50,52]
-g0_masked_cube = g0_mask_cube(solved_if_cube, eo_pieces)
-g0_table = gen_pruning_table(["".join(g0_masked_cube.state)], g0_depth, g0_moves)
-
-# G1 pruning table (CO + EO split)
-co_pieces = [0,2,6,8,45,47,51,53]
-eo_ud_pieces = [1,3,5,7,46,48,50,52]
-eo_e_pieces = [21,23,39,41]
-g1_masked_cube = g1_mask_cube(solved_if_cube, co_pieces, eo_ud_pieces, eo_e_pieces)
-g1_table = gen_pruning_table(["".join(g1_masked_cube.state)], g1_depth, g1_moves)
-
-# G2 pruning table
-g2_masked_cube = g2_mask_cube(solved_if_cube)
-g2_solved_states = list(gen_pruning_table(["".join(g2_masked_cube.state)], 10, [
-    "U2", "D2", "F2", "B2", "L2", "R2"
-]).keys())
-g2_table = gen_pruning_table(g2_solved_states, g2_depth, g2_moves)
-
-# G3 pruning table
-g3_table = gen_pruning_table(["".join(solved_cube.state)], g3_depth, g3_moves)
+g0_move_tables = (
+    cached_table("flip_moves", g0_moves, lambda: flip_move_table(g0_moves)),
+    [[0]] * len(g0_moves)
+)
+g0_solved_state = coord_index(g0_coords(solved_cube), 1)
+g0_table = pruning_table_source(
+    "g0_table", pruning_table_keys["g0_table"],
+    lambda: gen_coord_pruning_table([g0_solved_state], g0_depth, g0_move_tables, 1, N_FLIP)
+)
+
+# G1 pruning table (CO + UD-slice)
+g1_move_tables = (
+    cached_table("twist_moves", g1_moves, lambda: twist_move_table(g1_moves)),
+    cached_table("slice_moves", g1_moves, lambda: slice_move_table(g1_moves))
+)
+g1_solved_state = coord_index(g1_coords(solved_cube), N_SLICE)
+if symmetry_tables:
+    g1_table = sym_pruning_table_source(
+        "g1_table", pruning_table_keys["g1_table"], g1_moves, N_SLICE, N_TWIST,
+        slice_conj_table, twist_conj_table,
+        lambda lookup, y_conj: gen_sym_pruning_table([g1_solved_state], g1_depth, g1_move_tables,
+                                                     N_SLICE, lookup, y_conj)
+    )
+else:
+    g1_table = pruning_table_source(
+        "g1_table", pruning_table_keys["g1_table"],
+        lambda: gen_coord_pruning_table([g1_solved_state], g1_depth, g1_move_tables, N_SLICE,
+                                        N_TWIST * N_SLICE)
+    )
 
-print("Pruning tables generated.")
+# G2 pruning table (M-slice edges + corner permutation). Corner permutations are numbered
+# so the 96 reachable with half turns come first, which makes the G3 target states one
+# contiguous range of coordinates: membership is a range check and seeds the table.
+g2_move_tables = (
+    cached_table("m_slice_moves", g2_moves, lambda: m_slice_move_table(g2_moves)),
+    cached_table("corner_perm_moves", g2_moves, lambda: corner_perm_move_table(g2_moves))
+)
+g2_solved_m_slice = g2_coords(solved_cube)[0]
+g2_solved_states = range(g2_solved_m_slice * N_CORNER_PERM,
+                         g2_solved_m_slice * N_CORNER_PERM + N_G3_CORNER_PERM)
+if symmetry_tables:
+    g2_table = sym_pruning_table_source(
+        "g2_table", pruning_table_keys["g2_table"], g2_moves, N_CORNER_PERM, N_M_SLICE,
+        corner_perm_conj_table, m_slice_conj_table,
+        lambda lookup, y_conj: gen_sym_pruning_table(g2_solved_states, g2_depth, g2_move_tables,
+                                                     N_CORNER_PERM, lookup, y_conj)
+    )
+else:
+    g2_table = pruning_table_source(
+        "g2_table", pruning_table_keys["g2_table"],
+        lambda: gen_coord_pruning_table(g2_solved_states, g2_depth, g2_move_tables, N_CORNER_PERM,
+                                        N_M_SLICE * N_CORNER_PERM)
+    )
 
-def thistlethwaite(g0_table, g1_table, g2_table, g2_solved_states, g3_table, visualize=False):
+# G3 pruning table (G3 corner permutation + edge permutations within the slices)
+g3_move_tables = (
+    cached_table("corner_perm_moves", g3_moves, lambda: corner_perm_move_table(g3_moves)),
+    cached_table("slice_perm_moves", g3_moves, lambda: slice_perm_move_table(g3_moves))
+)
+g3_solved_state = coord_index(g3_coords(solved_cube), N_SLICE_PERM)
+g3_table = pruning_table_source(
+    "g3_table", pruning_table_keys["g3_table"],
+    lambda: gen_coord_pruning_table([g3_solved_state], g3_depth, g3_move_tables, N_SLICE_PERM,
+                                    N_G3_CORNER_PERM * N_SLICE_PERM)
+)
 
-    scramble = get_random_scramble(g0_moves, 25)
+print("Pruning tables generated.")
 
+def unlink_shared_tables():
+    """Removes the pruning tables published to shared memory once no new solver processes need them."""
+    for name, key in pruning_table_keys.items():
+        unlink_table(name, key)
+
+# Group each phase reduces the cube to and the longest solution it searches for
+PHASE_TARGETS = ("G1", "G2", "G3", "G4 (solved)")
+PHASE_DEPTH_LIMITS = (14, 14, 18, 17)
+
+def phase_solvers(g0_table, g1_table, g2_table, g2_solved_states, g3_table):
+    """
+    Returns:
+        list: (solver, coords_fn) of the four phases in solving order, where
+              coords_fn(cube) gives the phase coordinates of a cube.
+    """
+    def g2_is_solved(state):
+        return state in g2_solved_states
+
+    return [
+        (Solver(lambda state: state == g0_solved_state, g0_moves, g0_table, g0_depth,
+                g0_move_tables, 1), g0_coords),
+        (Solver(lambda state: state == g1_solved_state, g1_moves, g1_table, g1_depth,
+                g1_move_tables, N_SLICE), g1_coords),
+        (Solver(g2_is_solved, g2_moves, g2_table, g2_depth, g2_move_tables, N_CORNER_PERM), g2_coords),
+        (Solver(lambda state: state == g3_solved_state, g3_moves, g3_table, g3_depth,
+                g3_move_tables, N_SLICE_PERM), g3_coords),
+    ]
+
+# Phase solutions of this process, keyed by phase coordinate
+phase_memo = PhaseMemo()
+
+def solve_phase(phase, solver, coords, depth_limit, memo=None, deadline=None, stats=None):
+    """
+    Returns `solve_ida_coord`'s solution of a phase, reusing it from the memo when
+    another cube already had these phase coordinates.
+
+    IDA* finds the same first solution under any depth limit that allows it, so a
+    memoized solution also answers searches with a smaller limit.
+
+    Args:
+        stats (SearchStats, optional): Counters of the phase search.
+    """
+    if memo is None:
+        return next(ida_coord_solutions(solver, coords, depth_limit, deadline, stats), None)
+    key = coord_index(coords, solver.coord_size)
+    solution = memo.get(phase, key)
+    if solution is not None:
+        if stats is not None:
+            stats.memo_hits += 1
+        return solution if len(solution.split()) <= depth_limit else None
+    solution = next(ida_coord_solutions(solver, coords, depth_limit, deadline, stats), None)
+    if solution is not None:
+        memo.put(phase, key, solution)
+    return solution
+
+def solve_phases(cube, g0_table, g1_table, g2_table, g2_solved_states, g3_table, visualize=False,
+                 memo=phase_memo, stats=None):
+    """
+    Reduces a cube through G1, G2 and G3 to the solved state.
+
+    The cube is turned along with each phase solution, so it ends up solved.
+    Phase solutions are looked up in and added to `memo` (None to always search).
+    With `stats` (a SolveStats) each phase's search is counted and timed under
+    its PHASE_TARGETS name.
+
+    Returns:
+        list: The four phase solutions (a phase that is already solved gives ""),
+              or None if a phase search failed.
+    """
+    phases = []
+    solvers = phase_solvers(g0_table, g1_table, g2_table, g2_solved_states, g3_table)
+    for phase, ((solver, coords), target, depth_limit) in enumerate(zip(solvers, PHASE_TARGETS,
+                                                                         PHASE_DEPTH_LIMITS)):
+        with stats.timed(target) if stats is not None else nullcontext() as phase_stats:
+            solution = solve_phase(phase, solver, coords(cube), depth_limit, memo, stats=phase_stats)
+
+        if solution is None:
+            return None
+
+        cube.rotate(solution)
+
+        if visualize:
+            print(f"Reduce to {target}:\n{solution}")
+            cube.display_cube()
+
+        phases.append(solution)
+    return phases
+
+def solve_phases_anytime(cube, g0_table, g1_table, g2_table, g2_solved_states, g3_table, deadline,
+                        memo=phase_memo, stats=None):
+    """
+    Yields ever shorter phase solutions of a cube until the deadline.
+
+    The G1 phase solutions are tried in order of length, the first one giving the
+    `solve_phases` solution. Each is followed by the shortest later phases that still
+    beat the best total so far. The search always runs to a first solution; after
+    that it stops at the deadline (within the G1 phase search too) or once the G1
+    phase alone is as long as the best. The later phases go through `memo` and are
+    counted in `stats` like in `solve_phases`; the G1 phase search, paused between
+    its solutions, is counted but not timed. The cube is not turned.
+
+    Yields:
+        list: Four phase solutions, each set shorter in total than the one before.
+    """
+    solvers = phase_solvers(g0_table, g1_table, g2_table, g2_solved_states, g3_table)
+    g0_solver, g0_coords_fn = solvers[0]
+    best_length = sum(PHASE_DEPTH_LIMITS) + 1
+
+    g1_stats = stats.phase(PHASE_TARGETS[0]) if stats is not None else None
+    for g1_solution in _g1_solutions(g0_solver, g0_coords_fn(cube), deadline, g1_stats):
+        moves_left = best_length - 1 - len(g1_solution.split())
+        if moves_left < 0:
+            return
+        found = best_length <= sum(PHASE_DEPTH_LIMITS)
+
+        phase_cube = cube.copy()
+        phase_cube.rotate(g1_solution)
+        phases = [g1_solution]
+        for phase, ((solver, coords), depth_limit) in enumerate(zip(solvers[1:], PHASE_DEPTH_LIMITS[1:]), 1):
+            with stats.timed(PHASE_TARGETS[phase]) if stats is not None else nullcontext() as phase_stats:
+                solution = solve_phase(phase, solver, coords(phase_cube), min(depth_limit, moves_left), memo,
+                                       deadline if found else None, phase_stats)
+            if solution is None:
+                break
+            phase_cube.rotate(solution)
+            moves_left -= len(solution.split())
+            phases.append(solution)
+        else:
+            best_length = len(join_phases(phases).split())
+            yield phases
+
+        if default_timer() > deadline:
+            return
+
+def _g1_solutions(solver, coords, deadline, stats):
+    # The first G1 solution is searched for whatever the deadline, since the later
+    # phases always complete it within their depth limits; the search for the others
+    # stops at the deadline
+    first = next(ida_coord_solutions(solver, coords, PHASE_DEPTH_LIMITS[0], stats=stats), None)
+    if first is None:
+        return
+    yield first
+    for solution in ida_coord_solutions(solver, coords, PHASE_DEPTH_LIMITS[0], deadline, stats):
+        if solution != first:
+            yield solution
+
+def join_phases(phases):
+    """Joins the phase solutions, merging the turns that cancel across phase boundaries."""
+    return simplify(" ".join(p for p in phases if p))
+
+def scrambled_cube(scramble=None, cube=None):
+    """
+    The cube a demo solve starts from: a copy of `cube` when given, else a solved
+    cube turned by `scramble` (a random 25 move one by default).
+
+    Returns:
+        tuple: (cube, scramble) where scramble is the move sequence or, for an
+               explicit cube, its facelet string.
+    """
+    if cube is not None:
+        return cube.copy(), "".join(cube.state)
+
+    if scramble is None:
+        scramble = get_random_scramble(g0_moves, 25)
     cube = Cube()
     cube.rotate(scramble)
+    return cube, scramble
 
-    if visualize:
-        print(f"\nScramble Cube\n{scramble}")
-        cube.display_cube()
-
-    g0_masked_cube = g0_mask_cube(solved_if_cube, [1,3,5,7,21,23,39,41,46,48,50,52])
-    g0_masked_cube.rotate(scramble)
-
-    g0_solver = Solver(g0_is_solved, g0_moves, g0_table, g0_depth)
-    t1 = default_timer()
-    g1_solution = solve_iidfs_pruning(g0_solver, g0_masked_cube, 14)
-
-    if not g1_solution:
-        return (0, 0)
+def thistlethwaite(g0_table, g1_table, g2_table, g2_solved_states, g3_table, visualize=False, scramble=None,
+                   cache=None, stats=None, cube=None):
 
-    cube.rotate(str(g1_solution))
+    cube, scramble = scrambled_cube(scramble, cube)
 
     if visualize:
-        print(f"Reduce to G1:\n{str(g1_solution)}")
+        print(f"\nScramble Cube\n{scramble}")
         cube.display_cube()
 
-    g1_masked_cube = g1_mask_cube(solved_if_cube,
-                                  [0,2,6,8,45,47,51,53],
-                                  [1,3,5,7,46,48,50,52],
-                                  [21,23,39,41])
-    g1_masked_cube.rotate(scramble + " " + str(g1_solution))
+    t1 = default_timer()
+    state = cube.state.copy()
+    full_solution = cache.get(state) if cache is not None else None
+    if full_solution is None:
+        phases = solve_phases(cube, g0_table, g1_table, g2_table, g2_solved_states, g3_table, visualize,
+                              stats=stats)
+        if phases is None:
+            return (0, 0)
+        full_solution = join_phases(phases)
+        if cache is not None:
+            cache.put(state, full_solution)
+    t2 = default_timer()
 
-    g1_solver = Solver(g1_is_solved, g1_moves, g1_table, g1_depth)
-    g2_solution = solve_iidfs_pruning(g1_solver, g1_masked_cube, 14)
+    print("\nSolver found solution: ", full_solution, "["+str(len(full_solution.split()))+"]")
+    print(f"Total Time: {t2 - t1}s")
+    if stats is not None:
+        for phase_stats in stats.phases.values():
+            print(f"  {phase_stats.phase}: {phase_stats.nodes} nodes, {phase_stats.iterations} iterations "
+                  f"to depth {phase_stats.depth}, {phase_stats.time * 1000:.2f}ms")
+    return ((t2 - t1) * 1000, len(full_solution.split()))
 
-    if not g2_solution:
-        return (0, 0)
+def kociemba(visualize=False, scramble=None, time_budget=1.0, cube=None):
 
-    cube.rotate(str(g2_solution))
+    cube, scramble = scrambled_cube(scramble, cube)
 
     if visualize:
-        print(f"Reduce to G2:\n{str(g2_solution)}")
+        print(f"\nScramble Cube\n{scramble}")
         cube.display_cube()
 
-    g2_masked_cube = g2_mask_cube(solved_if_cube)
-    g2_masked_cube.rotate(scramble + " " + str(g1_solution) + " " + str(g2_solution))
-
-    def g2_is_solved(cube):
-        return "".join(cube.state) in g2_solved_states
-
-    g2_solver = Solver(g2_is_solved, g2_moves, g2_table, g2_depth)
-    g3_solution = solve_iidfs_pruning(g2_solver, g2_masked_cube, 18)
+    t1 = default_timer()
+    solution = solve_cube(cube, "kociemba", time_budget)
+    t2 = default_timer()
 
-    if not g3_solution:
+    if solution is None:
         return (0, 0)
 
-    cube.rotate(str(g3_solution))
-
     if visualize:
-        print(f"Reduce to G3:\n{str(g3_solution)}")
         cube.display_cube()
 
-    g3_solver = Solver(g3_is_solved, g3_moves, g3_table, g3_depth)
-    g4_solution = solve_iidfs_pruning(g3_solver, cube, 17)
-    t2 = default_timer()
-
-    if not g4_solution:
-        return (0, 0)
+    print("\nSolver found solution: ", solution, "["+str(len(solution.split()))+"]")
+    print(f"Total Time: {t2 - t1}s")
+    return ((t2 - t1) * 1000, len(solution.split()))
+
+ENGINES = ("thistlethwaite", "kociemba")
+
+def anytime_solutions(cube, time_budget, engine="thistlethwaite", stats=None):
+    """
+    Yields ever shorter solutions of a cube until the time budget runs out.
+
+    The first solution comes as soon as the engine has one, whatever the budget;
+    each later one is strictly shorter. The cube is not turned.
+
+    Args:
+        cube (Cube): The cube to solve.
+        time_budget (float): Seconds to keep searching for shorter solutions.
+        engine (str): Solver engine, see `solve_cube`.
+        stats (SolveStats, optional): Counters of the engine's phase searches.
+
+    Yields:
+        str: Solutions, each shorter than the last.
+    """
+    if engine == "thistlethwaite":
+        deadline = default_timer() + time_budget
+        for phases in solve_phases_anytime(cube, g0_table, g1_table, g2_table, g2_solved_states,
+                                           g3_table, deadline, stats=stats):
+            yield join_phases(phases)
+    elif engine == "kociemba":
+        load_two_phase_tables()  # Building missing tables does not count against the budget
+        deadline = default_timer() + time_budget
+        yield from two_phase_solutions(facelets_to_cubie(cube.state), deadline, stats=stats)
+    else:
+        raise ValueError(f"Unknown engine {engine!r}, expected one of {ENGINES}")
+
+def solve_anytime(cube, time_budget, engine="thistlethwaite", on_solution=None, stats=None):
+    """
+    Solves a cube with the shortest solution found within the time budget.
+
+    Args:
+        cube (Cube): The cube to solve; it is turned along with the returned solution.
+        time_budget (float): Seconds to keep searching for shorter solutions.
+        engine (str): Solver engine, see `solve_cube`.
+        on_solution (callable, optional): Called as on_solution(solution, elapsed_ms)
+            with each improvement as soon as it is found.
+        stats (SolveStats, optional): Counters of the engine's phase searches.
+
+    Returns:
+        str: The shortest solution found, or None if the search failed.
+    """
+    t1 = default_timer()
+    solution = None
+    for solution in anytime_solutions(cube, time_budget, engine, stats):
+        if on_solution is not None:
+            on_solution(solution, (default_timer() - t1) * 1000)
+    if solution is not None:
+        cube.rotate(solution)
+    return solution
+
+def solve_cube(cube, engine="thistlethwaite", time_budget=1.0, cache=None, stats=None):
+    """
+    Solves a cube with the chosen engine; the cube is turned along with the solution.
+
+    Args:
+        cube (Cube): The cube to solve.
+        engine (str): "thistlethwaite" for the fast four phase solver (30-45 moves) or
+            "kociemba" for the two-phase solver (about 21 moves, see two_phase.py).
+        time_budget (float): Seconds the two-phase solver keeps looking for shorter
+            solutions once it has one.
+        cache (SolutionCache, optional): Solutions to reuse; new solutions are added.
+        stats (SolveStats, optional): Filled with the counters of each phase search,
+            see search_stats.py.
+
+    Returns:
+        str: The solution, or None if the search failed.
+    """
+    state = cube.state.copy()
+    if cache is not None:
+        solution = cache.get(state, engine)
+        if solution is not None:
+            cube.rotate(solution)
+            return solution
 
-    cube.rotate(str(g4_solution))
+    if engine == "thistlethwaite":
+        phases = solve_phases(cube, g0_table, g1_table, g2_table, g2_solved_states, g3_table, stats=stats)
+        solution = None if phases is None else join_phases(phases)
+    elif engine == "kociemba":
+        solution = solve_two_phase(state, time_budget, stats=stats)
+        if solution is not None:
+            cube.rotate(solution)
+    else:
+        raise ValueError(f"Unknown engine {engine!r}, expected one of {ENGINES}")
 
-    if visualize:
-        print(f"Reduce to G4 (solved):\n{str(g4_solution)}")
-        cube.display_cube()
+    if cache is not None and solution is not None:
+        cache.put(state, solution, engine)
+    return solution
 
-    full_solution = str(g1_solution) + " " + str(g2_solution) + " " + str(g3_solution) + " " + str(g4_solution)
-    print("\nSolver found solution: ", full_solution, "["+str(len(full_solution.split(" ")))+"]")
-    print(f"Total Time: {t2 - t1}s")
-    return ((t2 - t1) * 1000, len(full_solution.split(" ")))
+def _solve_job(job, engine="thistlethwaite", time_budget=1.0):
+    # Runs in a pool worker and reads the tables of the worker's copy of this module
+    index, scramble = job
+    cube = Cube()
+    cube.rotate(scramble)
+    t1 = default_timer()
+    solution = solve_cube(cube, engine, time_budget)
+    t2 = default_timer()
+    return index, scramble, solution, (t2 - t1) * 1000
+
+def _split_cache_hits(jobs, cache, engine):
+    """Returns the results of the jobs the cache can answer and the jobs left to solve."""
+    hits, misses = [], []
+    for index, scramble in jobs:
+        cube = Cube()
+        cube.rotate(scramble)
+        t1 = default_timer()
+        solution = cache.get(cube.state, engine)
+        t2 = default_timer()
+        if solution is None:
+            misses.append((index, scramble))
+        else:
+            hits.append((index, scramble, solution, (t2 - t1) * 1000))
+    return hits, misses
+
+@contextmanager
+def solver_pool(workers=None, engine="thistlethwaite"):
+    """
+    Pool of worker processes that share this process's loaded tables, see `solve_many`.
+
+    Args:
+        workers (int, optional): Number of worker processes, defaults to the CPU count.
+        engine (str): Solver engine whose tables the workers need.
+    """
+    if engine == "kociemba":
+        load_two_phase_tables()  # Loaded once here and inherited by the workers
+    start_method = "fork" if "fork" in multiprocessing.get_all_start_methods() else None
+    # Keep the collector from touching (and so copying) the inherited table objects
+    gc.freeze()
+    try:
+        with multiprocessing.get_context(start_method).Pool(workers) as pool:
+            yield pool
+    finally:
+        gc.unfreeze()
+
+def _solve_chunk(chunk, engine="thistlethwaite", time_budget=1.0):
+    return [_solve_job(job, engine, time_budget) for job in chunk]
+
+# Chunks of scrambles per worker queued or being solved at a time by `solve_many`
+IN_FLIGHT_CHUNKS = 4
+
+def solve_many(scrambles, workers=None, chunksize=4, engine="thistlethwaite", time_budget=1.0, cache=None):
+    """
+    Solves many scrambles across a pool of worker processes.
+
+    Workers are forked from this process so they share its already loaded move and
+    pruning tables read-only instead of having them pickled per task. Where fork is
+    not available the workers are spawned and load the tables from the table cache.
+
+    At most IN_FLIGHT_CHUNKS chunks per worker are out at a time and the next chunk
+    is read as soon as one finishes, so the workers never wait on a slow chunk and
+    a long or endless iterable is solved in constant memory.
+
+    Args:
+        scrambles (iterable of str): Move sequences to solve.
+        workers (int, optional): Number of worker processes, defaults to the CPU
+            count. With 1 the scrambles are solved in this process.
+        chunksize (int): Scrambles handed to a worker at a time.
+        engine (str): Solver engine, see `solve_cube`.
+        time_budget (float): Per scramble budget of the two-phase engine.
+        cache (SolutionCache, optional): Checked in this process for each chunk of
+            scrambles before it is sent out; cache hits are yielded straight away
+            and new solutions are added.
+
+    Yields:
+        tuple: (index, scramble, solution, time_ms) as each solve completes, where
+               index is the scramble's position in the input and solution is None
+               if a phase search failed.
+    """
+    solve_chunk = partial(_solve_chunk, engine=engine, time_budget=time_budget)
+    jobs = enumerate(scrambles)
+    chunks = iter(lambda: list(islice(jobs, chunksize)), [])
+    max_in_flight = IN_FLIGHT_CHUNKS * (workers or os.cpu_count() or 1)
+
+    def finished(results):
+        for result in results:
+            _, scramble, solution, _ = result
+            if cache is not None and solution is not None:
+                cube = Cube()
+                cube.rotate(scramble)
+                cache.put(cube.state, solution, engine)
+            yield result
+
+    # Finished chunks, or the exception of a failed one, handed over by the pool
+    done = queue.SimpleQueue()
+    in_flight = 0
+
+    def next_finished():
+        nonlocal in_flight
+        results = done.get()
+        in_flight -= 1
+        if isinstance(results, BaseException):
+            raise results
+        return finished(results)
+
+    with solver_pool(workers, engine) if workers != 1 else nullcontext() as pool:
+        for chunk in chunks:
+            if cache is not None:
+                hits, chunk = _split_cache_hits(chunk, cache, engine)
+                yield from hits
+                if not chunk:
+                    continue
+            if pool is None:
+                yield from finished(solve_chunk(chunk))
+                continue
+
+            pool.apply_async(solve_chunk, (chunk,), callback=done.put, error_callback=done.put)
+            in_flight += 1
+            while in_flight >= max_in_flight or not done.empty():
+                yield from next_finished()
+        while in_flight:
+            yield from next_finished()
 
 """
 def thistlethwaite():
@@ -557,16 +1259,20 @@ def thistlethwaite():
 
 """
     
-def simulate_solves(num_solves):
+def simulate_solves(num_solves, workers=None):
+    # Plotting is optional: benchmark.py gives the same numbers headless
+    import matplotlib.pyplot as plt
+
     times = []
     num_moves = []
     num_solved = 0
 
-    for i in range(num_solves):
+    scrambles = (get_random_scramble(g0_moves, 25) for _ in range(num_solves))
+    for i, (_, _, solution, time) in enumerate(solve_many(scrambles, workers)):
         if i % 100 == 0:
             print(f"{i}/{num_solves}")
-        time, moves = thistlethwaite(g0_table, g1_table, g2_table, g2_solved_states, g3_table)
-        if moves:
+        moves = len(solution.split()) if solution is not None else 0
+        if solution is not None:
             num_solved += 1
         times.append(time)
         num_moves.append(moves)
@@ -590,7 +1296,7 @@ def simulate_solves(num_solves):
 
 
 def main():
-    thistlethwaite(g0_table, g1_table, g2_table, g2_solved_states, g3_table, visualize=True)
+    thistlethwaite(g0_table, g1_table, g2_table, g2_solved_states, g3_table, visualize=True, stats=SolveStats())
     #simulate_solves(10000)
 
 if __name__ == "__main__":
@@ -0,0 +1,110 @@
+from timeit import default_timer
+
+
+class SearchStats:
+    """
+    Counters of the search of one phase, summed over every search of that phase
+    in a solve.
+
+    Attributes:
+        iterations (int): Depth bounds tried (IDA* iterations).
+        nodes (int): Nodes generated.
+        table_misses (int): Pruning table lookups that found no stored distance.
+        prunes (int): Nodes cut off by their lower bound.
+        depth (int): Deepest bound searched.
+        memo_hits (int): Searches skipped because the phase memo had the solution.
+        time (float): Wall time in seconds.
+    """
+    def __init__(self, phase, on_event=None):
+        self.phase = phase
+        self.on_event = on_event
+        self.iterations = 0
+        self.nodes = 0
+        self.table_misses = 0
+        self.prunes = 0
+        self.depth = 0
+        self.memo_hits = 0
+        self.time = 0.0
+
+    @property
+    def table_hit_rate(self):
+        """Share of the pruning table lookups (one per node) that found a distance."""
+        return 1 - self.table_misses / self.nodes if self.nodes else 0.0
+
+    def add(self, nodes=0, table_misses=0, prunes=0):
+        self.nodes += nodes
+        self.table_misses += table_misses
+        self.prunes += prunes
+
+    def iteration(self, bound):
+        """Records the start of a search to depth `bound`."""
+        self.iterations += 1
+        if bound > self.depth:
+            self.depth = bound
+        self.emit("iteration", bound=bound, nodes=self.nodes)
+
+    def emit(self, event, **fields):
+        if self.on_event is not None:
+            self.on_event({"event": event, "phase": self.phase, **fields})
+
+    def as_dict(self):
+        return {
+            "phase": self.phase,
+            "iterations": self.iterations,
+            "nodes": self.nodes,
+            "table_hit_rate": self.table_hit_rate,
+            "prunes": self.prunes,
+            "depth": self.depth,
+            "memo_hits": self.memo_hits,
+            "time": self.time,
+        }
+
+
+class SolveStats:
+    """
+    Per-phase `SearchStats` of a solve.
+
+    Args:
+        on_event (callable, optional): Called with a dict for every structured event:
+            "phase_start", "iteration" (with the new bound) and "phase_end" (with the
+            phase's counters so far).
+    """
+    def __init__(self, on_event=None):
+        self.on_event = on_event
+        self.phases = {}
+
+    def phase(self, name):
+        """The stats of a phase, created on first use."""
+        if name not in self.phases:
+            self.phases[name] = SearchStats(name, self.on_event)
+        return self.phases[name]
+
+    def timed(self, name):
+        """Context manager adding the time spent inside it to a phase."""
+        return _PhaseTimer(self.phase(name))
+
+    @property
+    def nodes(self):
+        return sum(stats.nodes for stats in self.phases.values())
+
+    @property
+    def time(self):
+        return sum(stats.time for stats in self.phases.values())
+
+    def as_dict(self):
+        return {name: stats.as_dict() for name, stats in self.phases.items()}
+
+
+class _PhaseTimer:
+    def __init__(self, stats):
+        self.stats = stats
+
+    def __enter__(self):
+        self.stats.emit("phase_start")
+        self.start = default_timer()
+        return self.stats
+
+    def __exit__(self, *exc_info):
+        self.stats.time += default_timer() - self.start
+        self.stats.emit("phase_end", **self.stats.as_dict())
+        return False
@@ -0,0 +1,198 @@
+import os
+import sys
+import time
+import atexit
+import struct
+from multiprocessing import shared_memory, resource_tracker
+from pruning_table import PruningTable
+from table_cache import cached_table, key_digest
+
+# ready flag, pid of the owning process, table size; the packed table bytes follow
+BLOCK_HEADER = struct.Struct("<B3xIQ")
+BLOCK_PREFIX = "rcs"
+ATTACH_TIMEOUT = 30.0
+# Where POSIX shared memory blocks show up as files (Linux)
+SHM_DIR = "/dev/shm"
+
+# Blocks this process has mapped with the table viewing each, kept for the process lifetime
+_blocks = {}
+# Blocks to unlink when their owner exits: block name -> owning pid. Forked children
+# inherit the dict, so the pid keeps them from unlinking their parent's blocks.
+_owned = {}
+
+
+def block_name(name, key):
+    # Short enough for macOS' 31 character limit; the key digest keeps stale tables apart
+    return BLOCK_PREFIX + key_digest(name, key).hex()[:24]
+
+
+def _open_block(block, create=False, size=0):
+    shm = shared_memory.SharedMemory(name=block, create=create, size=size)
+    # Blocks outlive the process that maps them, so stop the resource tracker from
+    # unlinking them when any process exits; the owner unlinks them itself
+    resource_tracker.unregister(shm._name, "shared_memory")
+    return shm
+
+def _unlink_block(shm):
+    # unlink() unregisters the block from the resource tracker again
+    resource_tracker.register(shm._name, "shared_memory")
+    try:
+        shm.unlink()
+    except FileNotFoundError:  # Already removed by another process
+        resource_tracker.unregister(shm._name, "shared_memory")
+
+def _table_view(shm):
+    ready, _, size = BLOCK_HEADER.unpack_from(shm.buf)
+    return ready, PruningTable(size, shm.buf[BLOCK_HEADER.size:BLOCK_HEADER.size + (size + 1) // 2])
+
+def _owner(shm):
+    return BLOCK_HEADER.unpack_from(shm.buf)[1]
+
+def _alive(pid):
+    if pid == 0 or os.name != "posix":  # Not yet written, or no way to tell
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:  # Alive, run by another user
+        pass
+    return True
+
+def _orphaned(shm):
+    # A ready block always names its owner, except one written before owners were recorded
+    ready, pid, _ = BLOCK_HEADER.unpack_from(shm.buf)
+    return (ready and pid == 0) or not _alive(pid)
+
+def _claim(block, shm):
+    ready, _, size = BLOCK_HEADER.unpack_from(shm.buf)
+    BLOCK_HEADER.pack_into(shm.buf, 0, ready, os.getpid(), size)
+    _owned[block] = os.getpid()
+
+
+def attach_table(name, key):
+    """
+    Maps a pruning table published by another process, or returns None if there is none.
+
+    Waits for a block that is still being filled by its creator. A block whose
+    owner has exited is adopted, so it is unlinked when this process exits.
+
+    Raises:
+        TimeoutError: If the block is never marked ready, as when its creator died
+            while filling it.
+    """
+    block = block_name(name, key)
+    try:
+        shm = _open_block(block)
+    except FileNotFoundError:
+        return None
+
+    deadline = time.monotonic() + ATTACH_TIMEOUT
+    ready, table = _table_view(shm)
+    while not ready:
+        if time.monotonic() > deadline or not _alive(_owner(shm)):
+            table.data.release()
+            shm.close()
+            raise TimeoutError(f"Shared table {block} was never marked ready")
+        time.sleep(0.01)
+        table.data.release()
+        ready, table = _table_view(shm)
+    if _orphaned(shm):
+        _claim(block, shm)
+    _blocks[block] = (shm, table)
+    return table
+
+def publish_table(name, key, table):
+    """
+    Copies a PruningTable into a named shared memory block owned by this process,
+    which unlinks it on exit.
+
+    Returns:
+        PruningTable: A view over the shared block, or the block another process
+            published first.
+    """
+    block = block_name(name, key)
+    try:
+        shm = _open_block(block, create=True, size=BLOCK_HEADER.size + len(table.data))
+    except FileExistsError:
+        return attach_table(name, key)
+
+    _owned[block] = os.getpid()
+    BLOCK_HEADER.pack_into(shm.buf, 0, 0, os.getpid(), table.size)
+    shm.buf[BLOCK_HEADER.size:BLOCK_HEADER.size + len(table.data)] = table.data
+    # Mark the block ready only once the data is in place
+    BLOCK_HEADER.pack_into(shm.buf, 0, 1, os.getpid(), table.size)
+    table = _table_view(shm)[1]
+    _blocks[block] = (shm, table)
+    return table
+
+def shared_table(name, key, build_fn):
+    """
+    Returns a pruning table held in shared memory, so every process on the host
+    maps one physical copy.
+
+    The first process loads the table through the table cache (building it if needed)
+    and publishes it; later processes attach to the published block. A block left
+    unfinished by a crashed publisher is unlinked and the table is mapped from the
+    cache file instead.
+    """
+    try:
+        table = attach_table(name, key)
+        if table is None:
+            table = publish_table(name, key, cached_table(name, key, build_fn, mapped=True))
+    except TimeoutError as e:
+        print(f"{e}, unlinking it and loading the table from the cache", file=sys.stderr)
+        unlink_table(name, key)
+        return cached_table(name, key, build_fn, mapped=True)
+    return table
+
+def unlink_table(name, key):
+    """Removes a published table; processes that already mapped it keep their mapping."""
+    block = block_name(name, key)
+    try:
+        shm = _blocks[block][0] if block in _blocks else _open_block(block)
+    except FileNotFoundError:
+        return
+    _unlink_block(shm)
+    _owned.pop(block, None)
+    if block not in _blocks:
+        shm.close()
+
+def unlink_orphaned_blocks(shm_dir=SHM_DIR):
+    """
+    Removes the table blocks whose owner is no longer running, such as those of a
+    killed solver or of an older table version.
+
+    Returns:
+        list: Names of the removed blocks.
+    """
+    removed = []
+    names = os.listdir(shm_dir) if os.path.isdir(shm_dir) else []
+    for block in sorted(names):
+        if not block.startswith(BLOCK_PREFIX) or block in _blocks:
+            continue
+        try:
+            shm = _open_block(block)
+        except FileNotFoundError:
+            continue
+        if shm.size < BLOCK_HEADER.size or _orphaned(shm):
+            _unlink_block(shm)
+            removed.append(block)
+        shm.close()
+    return removed
+
+
+@atexit.register
+def _close_blocks():
+    # The table views must be released before their mappings can close
+    for block, (shm, table) in _blocks.items():
+        table.data.release()
+        if _owned.get(block) == os.getpid():
+            _unlink_block(shm)
+        shm.close()
+    _blocks.clear()
+    _owned.clear()
+
+if __name__ == "__main__":
+    for block in unlink_orphaned_blocks():
+        print(f"Removed {block}")
@@ -0,0 +1,206 @@
+import os
+import json
+from collections import OrderedDict
+from symmetry import SYMMETRIES, INVERSE_SYMMETRY, conjugate_facelets, conjugate_moves
+
+CACHE_FILE_VERSION = 1
+DEFAULT_MAXSIZE = 100000
+DEFAULT_PHASE_MAXSIZE = 65536
+EVICTION_POLICIES = ("lru", "fifo")
+
+
+class SolutionCache:
+    """
+    Bounded cache of solutions keyed by solver engine and 54-facelet cube state.
+
+    With `normalize` set, a state is stored under the smallest of its 16 conjugates
+    by the U-D axis symmetries (see symmetry.py), so a scramble and its rotated or
+    mirrored versions share one entry; solutions are mapped through the symmetry
+    on the way in and out.
+
+    Args:
+        maxsize (int): Entries kept before evicting; None for no limit.
+        policy (str): "lru" evicts the least recently used entry, "fifo" the oldest.
+        normalize (bool): Share entries between symmetric states.
+        path (str, optional): File the cache is loaded from (when it exists) and
+            saved to by `save()`.
+    """
+    def __init__(self, maxsize=DEFAULT_MAXSIZE, policy="lru", normalize=False, path=None):
+        if policy not in EVICTION_POLICIES:
+            raise ValueError(f"Unknown eviction policy {policy!r}, expected one of {EVICTION_POLICIES}")
+        self.maxsize = maxsize
+        self.policy = policy
+        self.normalize = normalize
+        self.path = path
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if path is not None and os.path.exists(path):
+            self.load(path)
+
+    def _key(self, state, engine):
+        """Returns (key, sym) where sym takes the state to the one stored under key."""
+        state = "".join(state)
+        if not self.normalize:
+            return f"{engine}:{state}", 0
+        normalized, sym = min((conjugate_facelets(state, sym), sym) for sym in range(len(SYMMETRIES)))
+        return f"{engine}:{normalized}", sym
+
+    def get(self, state, engine="thistlethwaite"):
+        """Returns the cached solution of a facelet state, or None (counted as a miss)."""
+        key, sym = self._key(state, engine)
+        solution = self.entries.get(key)
+        if solution is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        if self.policy == "lru":
+            self.entries.move_to_end(key)
+        return conjugate_moves(solution, INVERSE_SYMMETRY[sym]) if sym else solution
+
+    def put(self, state, solution, engine="thistlethwaite"):
+        key, sym = self._key(state, engine)
+        self.entries[key] = conjugate_moves(solution, sym) if sym else solution
+        self.entries.move_to_end(key)
+        while self.maxsize is not None and len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def __len__(self):
+        return len(self.entries)
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self):
+        """Counters for monitoring."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": len(self.entries),
+            "maxsize": self.maxsize,
+        }
+
+    def _path(self, path):
+        path = path or self.path
+        if path is None:
+            raise ValueError("No cache file: pass a path or create the cache with one")
+        return path
+
+    def save(self, path=None):
+        """
+        Writes the entries, oldest first, so loading restores the eviction order.
+
+        Raises:
+            ValueError: If neither `path` nor the cache's own path is set.
+        """
+        path = self._path(path)
+        data = {
+            "version": CACHE_FILE_VERSION,
+            "normalize": self.normalize,
+            "entries": list(self.entries.items()),
+        }
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        # Write then rename so a crash never leaves a truncated cache file
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def load(self, path=None):
+        """
+        Adds the entries saved in a cache file.
+
+        Files from another version, or saved with a different `normalize` setting,
+        are ignored.
+
+        Returns:
+            int: The number of entries loaded.
+
+        Raises:
+            ValueError: If neither `path` nor the cache's own path is set.
+        """
+        path = self._path(path)
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return 0
+        if data.get("version") != CACHE_FILE_VERSION or data.get("normalize") != self.normalize:
+            return 0
+        for key, solution in data["entries"]:
+            self.entries[key] = solution
+            self.entries.move_to_end(key)
+        while self.maxsize is not None and len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+        return len(data["entries"])
+
+
+class PhaseMemo:
+    """
+    Bounded memo of phase solutions keyed by phase and phase coordinate.
+
+    A phase's solution depends only on the cube's coordinates in that phase (the
+    masked cube), which many scrambles share: the G0 -> G1 phase has just 2048 edge
+    orientations, so once warm it needs no search at all. Each phase keeps its own
+    entries, bounded and evicted like `SolutionCache`.
+
+    Args:
+        maxsize (int): Entries kept per phase before evicting; None for no limit.
+        policy (str): "lru" or "fifo", see `SolutionCache`.
+    """
+    def __init__(self, maxsize=DEFAULT_PHASE_MAXSIZE, policy="lru"):
+        if policy not in EVICTION_POLICIES:
+            raise ValueError(f"Unknown eviction policy {policy!r}, expected one of {EVICTION_POLICIES}")
+        self.maxsize = maxsize
+        self.policy = policy
+        self.phases = {}
+        self.hits = {}
+        self.misses = {}
+        self.evictions = {}
+
+    def get(self, phase, key):
+        """Returns the memoized solution of a phase state, or None (counted as a miss)."""
+        entries = self.phases.get(phase)
+        solution = entries.get(key) if entries is not None else None
+        if solution is None:
+            self.misses[phase] = self.misses.get(phase, 0) + 1
+            return None
+        self.hits[phase] = self.hits.get(phase, 0) + 1
+        if self.policy == "lru":
+            entries.move_to_end(key)
+        return solution
+
+    def put(self, phase, key, solution):
+        entries = self.phases.setdefault(phase, OrderedDict())
+        entries[key] = solution
+        entries.move_to_end(key)
+        while self.maxsize is not None and len(entries) > self.maxsize:
+            entries.popitem(last=False)
+            self.evictions[phase] = self.evictions.get(phase, 0) + 1
+
+    def __len__(self):
+        return sum(len(entries) for entries in self.phases.values())
+
+    def clear(self):
+        self.phases.clear()
+
+    def stats(self):
+        """Counters for monitoring, one dict per phase (see `SolutionCache.stats`)."""
+        stats = {}
+        for phase in sorted(self.hits.keys() | self.misses.keys() | self.phases.keys()):
+            hits, misses = self.hits.get(phase, 0), self.misses.get(phase, 0)
+            stats[phase] = {
+                "hits": hits,
+                "misses": misses,
+                "evictions": self.evictions.get(phase, 0),
+                "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+                "size": len(self.phases.get(phase, ())),
+                "maxsize": self.maxsize,
+            }
+        return stats
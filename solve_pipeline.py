@@ -0,0 +1,183 @@
+"""
+Streaming solves of scramble files.
+
+Reads one cube per line, either a move scramble ("R U2 F' ...") or a 54-facelet
+string in the layout of `Cube.state`, and writes one JSON object per line as the
+solutions come in:
+
+    python solve_pipeline.py scrambles.txt --output solutions.jsonl
+    cat scrambles.txt | python solve_pipeline.py --engine kociemba --workers 8
+
+Input is read lazily and at most --max-in-flight cubes are being solved at any
+time, so memory stays flat however long the input is. Output keeps input order.
+Blank lines and lines starting with # are skipped; a line that is not a valid
+cube gives a record with an "error" field instead of stopping the stream.
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+from collections import deque
+from functools import lru_cache
+from timeit import default_timer
+from coordinates import facelets_to_cubie
+from move_sequence import parse_moves
+
+FACELET_COLORS = frozenset("ULFRBD")
+# Centre facelet of each face, in face order: the centres fix which colour is which face
+CENTRES = (4, 13, 22, 31, 40, 49)
+
+
+@lru_cache(maxsize=None)
+def _load_solver():
+    # Importing the solver loads (or builds) its tables and reports on stdout,
+    # which is where the records go
+    with contextlib.redirect_stdout(sys.stderr):
+        import rubiks_cube_solver
+    return rubiks_cube_solver
+
+def _parity(perm):
+    # Each cycle of length n is n - 1 transpositions
+    seen, parity = set(), 0
+    for start in range(len(perm)):
+        if start in seen:
+            continue
+        i = perm[start]
+        while i != start:
+            seen.add(i)
+            i = perm[i]
+            parity ^= 1
+    return parity
+
+def _check_solvable(state):
+    if "".join(state[i] for i in CENTRES) != "ULFRBD":
+        raise ValueError("Centres are not in U L F R B D order")
+    cp, co, ep, eo = facelets_to_cubie(state)
+    if sorted(cp) != list(range(8)) or sorted(ep) != list(range(12)):
+        raise ValueError("Facelets repeat a piece")
+    if sum(co) % 3:
+        raise ValueError("Corner twists do not add up, the cube is unsolvable")
+    if sum(eo) % 2:
+        raise ValueError("Edge flips do not add up, the cube is unsolvable")
+    if _parity(cp) != _parity(ep):
+        raise ValueError("Corner and edge permutation parities differ, the cube is unsolvable")
+
+def parse_cube(line):
+    """
+    Builds the cube of an input line: a 54-facelet string or a move scramble.
+
+    Raises:
+        ValueError: If the line is neither, or its facelets are not a solvable cube.
+    """
+    solver = _load_solver()
+    text = line.strip()
+    if len(text) == 54 and FACELET_COLORS.issuperset(text):
+        _check_solvable(text)
+        return solver.Cube(text)
+
+    # Only the 18 face turns: Cube.rotate would read r as R and cannot turn slices
+    parse_moves(text)
+    cube = solver.Cube()
+    cube.rotate(text)
+    return cube
+
+def read_lines(lines):
+    """Yields (line number, text) of the input lines that hold a cube."""
+    for number, line in enumerate(lines, 1):
+        text = line.strip()
+        if text and not text.startswith("#"):
+            yield number, text
+
+def solve_line(job, engine="thistlethwaite", time_budget=1.0):
+    """
+    Solves one input line.
+
+    Returns:
+        dict: {"line", "input", "solution", "moves", "time_ms"} or, when the line
+              is not a valid cube or the search failed, {"line", "input", "error"}.
+    """
+    number, text = job
+    record = {"line": number, "input": text}
+    try:
+        cube = parse_cube(text)
+    except ValueError as e:
+        record["error"] = str(e)
+        return record
+
+    t1 = default_timer()
+    solution = _load_solver().solve_cube(cube, engine, time_budget)
+    t2 = default_timer()
+    if solution is None:
+        record["error"] = "No solution found"
+    else:
+        record["solution"] = solution
+        record["moves"] = len(solution.split())
+    record["time_ms"] = (t2 - t1) * 1000
+    return record
+
+def solve_stream(lines, engine="thistlethwaite", time_budget=1.0, workers=None, max_in_flight=None):
+    """
+    Solves a stream of input lines with bounded work in flight.
+
+    Lines are only read as earlier ones finish, so a file of any size runs in
+    constant memory, and unlike `solve_many` the records keep the input order.
+
+    Args:
+        lines (iterable of str): Scrambles or facelet strings, e.g. an open file.
+        engine (str): Solver engine, see `solve_cube`.
+        time_budget (float): Per cube budget of the two-phase engine.
+        workers (int, optional): Number of worker processes, defaults to the CPU
+            count. With 1 the lines are solved in this process.
+        max_in_flight (int, optional): Lines read ahead of the oldest unfinished one,
+            defaults to four per worker.
+
+    Yields:
+        dict: The record of each line (see `solve_line`), in input order.
+    """
+    solver = _load_solver()
+    if engine not in solver.ENGINES:
+        raise ValueError(f"Unknown engine {engine!r}, expected one of {solver.ENGINES}")
+    jobs = read_lines(lines)
+    if workers == 1:
+        for job in jobs:
+            yield solve_line(job, engine, time_budget)
+        return
+
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max(1, max_in_flight or 4 * workers)
+    with solver.solver_pool(workers, engine) as pool:
+        pending = deque()
+        for job in jobs:
+            pending.append(pool.apply_async(solve_line, (job, engine, time_budget)))
+            if len(pending) >= max_in_flight:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+def write_records(records, output):
+    """Writes records as JSON lines, flushing each so readers see it straight away."""
+    for record in records:
+        output.write(json.dumps(record) + "\n")
+        output.flush()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("input", nargs="?", default="-", help="file of scrambles, - for stdin (default)")
+    parser.add_argument("--output", default="-", help="file to write the JSON lines to, - for stdout (default)")
+    parser.add_argument("--engine", choices=("thistlethwaite", "kociemba"), default="thistlethwaite")
+    parser.add_argument("--time-budget", type=float, default=1.0,
+                        help="seconds per cube for the two-phase engine")
+    parser.add_argument("--workers", type=int, help="worker processes (default: CPU count)")
+    parser.add_argument("--max-in-flight", type=int, help="cubes read ahead of the oldest unsolved one")
+    args = parser.parse_args(argv)
+
+    with contextlib.ExitStack() as stack:
+        lines = sys.stdin if args.input == "-" else stack.enter_context(open(args.input))
+        output = sys.stdout if args.output == "-" else stack.enter_context(open(args.output, "w"))
+        records = solve_stream(lines, args.engine, args.time_budget, args.workers, args.max_in_flight)
+        write_records(records, output)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,207 @@
+from array import array
+from functools import lru_cache
+from move_maps import MOVES
+from coordinates import (
+    SOLVED_STATE, CORNER_FACELETS, CUBIE_MOVES, E_SLICE_EDGES, M_SLICE_EDGES, S_SLICE_EDGES,
+    facelets_to_cubie, cubie_to_facelets, set_twist, get_twist, comb_from_index, get_slice,
+    get_m_slice, CORNER_PERMS, CORNER_PERM_INDEX
+)
+
+FACES = "ULFRBD"
+
+
+def _whole_cube_turn(moves):
+    """Facelet map (src -> dst) and face colour map of a whole-cube rotation built from face and slice moves."""
+    state = list(range(54))
+    for move in moves.split(" "):
+        old_state = state.copy()
+        for src, dst in MOVES[move].items():
+            state[dst] = old_state[src]
+    perm = [0] * 54
+    for dst, src in enumerate(state):
+        perm[src] = dst
+    colors = {face: FACES[perm[9 * i + 4] // 9] for i, face in enumerate(FACES)}
+    return perm, colors
+
+def _mirror_lr():
+    """Reflection through the plane between the L and R faces."""
+    perm = [0] * 54
+    for face, target in zip(FACES, "URFLBD"):
+        src_base, dst_base = 9 * FACES.index(face), 9 * FACES.index(target)
+        for row in range(3):
+            for col in range(3):
+                perm[src_base + 3 * row + col] = dst_base + 3 * row + 2 - col
+    colors = {face: target for face, target in zip(FACES, "URFLBD")}
+    return perm, colors
+
+def _compose(first, second):
+    perm = [second[0][first[0][i]] for i in range(54)]
+    colors = {face: second[1][first[1][face]] for face in FACES}
+    return perm, colors
+
+def _generate_symmetries():
+    """All 16 symmetries of the cube that keep the U-D axis, identity first."""
+    generators = [
+        _whole_cube_turn("U E' D'"),   # quarter turn about the U-D axis
+        _whole_cube_turn("F2 S2 B2"),  # half turn about the F-B axis
+        _mirror_lr(),
+    ]
+    identity = (list(range(54)), {face: face for face in FACES})
+    symmetries = [identity]
+    seen = {tuple(identity[0])}
+    for sym in symmetries:
+        for generator in generators:
+            new_sym = _compose(sym, generator)
+            if tuple(new_sym[0]) not in seen:
+                seen.add(tuple(new_sym[0]))
+                symmetries.append(new_sym)
+    return symmetries
+
+SYMMETRIES = _generate_symmetries()
+
+
+def conjugate(cubie, sym):
+    """
+    Returns the cubie state seen through symmetry `sym`: the whole cube is rotated or
+    mirrored and the colours are renamed so the centres are back in place.
+    """
+    perm, colors = SYMMETRIES[sym]
+    facelets = cubie_to_facelets(cubie)
+    state = [''] * 54
+    for i in range(54):
+        state[perm[i]] = colors[facelets[i]]
+    return facelets_to_cubie(state)
+
+def conjugate_facelets(state, sym):
+    """Facelet string form of `conjugate`: the state seen through symmetry `sym`."""
+    perm, colors = SYMMETRIES[sym]
+    new_state = [''] * 54
+    for i in range(54):
+        new_state[perm[i]] = colors[state[i]]
+    return "".join(new_state)
+
+def _build_inverses():
+    identity = list(range(54))
+    return [
+        next(j for j, (inverse, _) in enumerate(SYMMETRIES) if [inverse[perm[i]] for i in range(54)] == identity)
+        for perm, _ in SYMMETRIES
+    ]
+
+# INVERSE_SYMMETRY[sym] undoes symmetry sym
+INVERSE_SYMMETRY = _build_inverses()
+
+@lru_cache(maxsize=None)
+def move_conjugates():
+    """move_conjugates()[sym][move] is the move `move` seen through symmetry `sym`."""
+    by_state = {str(cubie): move for move, cubie in CUBIE_MOVES.items()}
+    return [
+        {move: by_state[str(conjugate(cubie, sym))] for move, cubie in CUBIE_MOVES.items()}
+        for sym in range(len(SYMMETRIES))
+    ]
+
+def conjugate_moves(moves, sym):
+    """
+    Maps a move sequence through symmetry `sym`: if `moves` solves a state, the
+    result solves the state's conjugate `conjugate_facelets(state, sym)`.
+    """
+    conjugates = move_conjugates()[sym]
+    return " ".join(conjugates[move] for move in moves.split(" ") if move != '')
+
+def _solved_cubie():
+    return facelets_to_cubie(SOLVED_STATE)
+
+def symmetries_preserving(moves):
+    """Indices of the UD-axis symmetries that map the move set onto itself."""
+    by_state = {str(cubie): move for move, cubie in CUBIE_MOVES.items()}
+    move_set = set(moves)
+    return [
+        sym for sym in range(len(SYMMETRIES))
+        if all(by_state.get(str(conjugate(CUBIE_MOVES[move], sym))) in move_set for move in moves)
+    ]
+
+
+### Conjugation tables ###
+# Flat array('H') tables: table[k * n + coord] is the coordinate conjugated by syms[k].
+
+def twist_conj_table(syms):
+    cp, _, ep, eo = _solved_cubie()
+    return array("H", [
+        get_twist(conjugate((cp, set_twist(twist), ep, eo), sym)[1])
+        for sym in syms for twist in range(2187)
+    ])
+
+def _slice_cubie(occupied, slice_edges, other_edges):
+    cp, co, _, eo = _solved_cubie()
+    slice_iter, other_iter = iter(slice_edges), iter(other_edges)
+    ep = [next(slice_iter) if occ else next(other_iter) for occ in occupied]
+    return cp, co, ep, eo
+
+def slice_conj_table(syms):
+    return array("H", [
+        get_slice(conjugate(_slice_cubie(comb_from_index(index, 12, 4), E_SLICE_EDGES,
+                                         M_SLICE_EDGES + S_SLICE_EDGES), sym)[2])
+        for sym in syms for index in range(495)
+    ])
+
+def m_slice_conj_table(syms):
+    return array("H", [
+        get_m_slice(conjugate(_slice_cubie(comb_from_index(index, 8, 4) + [False] * 4,
+                                           M_SLICE_EDGES, S_SLICE_EDGES + E_SLICE_EDGES), sym)[2])
+        for sym in syms for index in range(70)
+    ])
+
+def corner_perm_conj_table(syms):
+    """Conjugates corner permutations as sigma * cp * sigma^-1, sigma being the symmetry's corner map."""
+    table = array("H")
+    for sym in syms:
+        perm = SYMMETRIES[sym][0]
+        slot_of = {facelet: slot for slot, facelets in enumerate(CORNER_FACELETS) for facelet in facelets}
+        sigma = [slot_of[perm[facelets[0]]] for facelets in CORNER_FACELETS]
+        for cp in CORNER_PERMS:
+            new_cp = [0] * 8
+            for i in range(8):
+                new_cp[sigma[i]] = sigma[cp[i]]
+            table.append(CORNER_PERM_INDEX[tuple(new_cp)])
+    return table
+
+
+def sym_reduce(conj_table, n, num_syms):
+    """
+    Splits a coordinate into symmetry classes, numbered in order of their smallest
+    member (the class representative).
+
+    Args:
+        conj_table: Conjugation table of the coordinate (see above).
+        n (int): Number of coordinate values.
+        num_syms (int): Number of symmetries in the table.
+
+    Returns:
+        tuple: (sym_class, sym_of) arrays, where sym_class[coord] is the class of a
+            coordinate and sym_of[coord] a symmetry conjugating it to the representative.
+    """
+    sym_class = array("H", [0xFFFF]) * n
+    sym_of = array("B", bytes(n))
+    num_classes = 0
+    for coord in range(n):
+        if sym_class[coord] != 0xFFFF:
+            continue
+        for k in range(num_syms):
+            conj = conj_table[k * n + coord]
+            if sym_class[conj] == 0xFFFF:
+                sym_class[conj] = num_classes
+                sym_of[conj] = next(j for j in range(num_syms) if conj_table[j * n + conj] == coord)
+        num_classes += 1
+    return sym_class, sym_of
+
+def class_stabilizers(conj_table, n, sym_class, num_syms):
+    """
+    Returns:
+        tuple: (reps, stabilizers) where reps[c] is the representative of class c and
+            stabilizers[c] the symmetries that leave it unchanged.
+    """
+    reps = []
+    for coord in range(n):
+        if sym_class[coord] == len(reps):
+            reps.append(coord)
+    stabilizers = [[k for k in range(num_syms) if conj_table[k * n + rep] == rep] for rep in reps]
+    return reps, stabilizers
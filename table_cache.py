@@ -0,0 +1,196 @@
+import os
+import mmap
+import struct
+import hashlib
+from array import array
+from pruning_table import PruningTable, StateSet
+
+# Bump whenever a coordinate encoding, the way a table is generated or the file layout
+# changes so stale caches are rebuilt
+CACHE_VERSION = 4
+CACHE_DIR = os.environ.get(
+    "RUBIKS_TABLE_CACHE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".table_cache")
+)
+# Check the payload checksum of memory-mapped tables on every load, which reads
+# each of their pages up front. Off by default: mapped files are checked when written.
+VERIFY_MAPPED = os.environ.get("RUBIKS_VERIFY_TABLES") == "1"
+
+# Tables this process built rather than loaded, so benchmarks can tell a cold load apart
+tables_built = 0
+
+MAGIC = b"RCST"
+MAPPABLE_KINDS = {b"P": PruningTable, b"S": StateSet}
+ARRAY_KIND = b"A"
+# magic, version, item size, kind, key digest, payload sha256, payload length
+HEADER = struct.Struct("<4sHBc32s32sQ")
+
+
+def key_digest(name, key):
+    return hashlib.sha256(repr((CACHE_VERSION, name, key)).encode()).digest()
+
+def cache_path(name, key):
+    return os.path.join(CACHE_DIR, f"{name}-{key_digest(name, key).hex()[:16]}.bin")
+
+
+def encode_table(table):
+    """
+    Serializes a table into (kind, payload bytes).
+
+    Supported tables are packed `PruningTable`s, `StateSet` bitsets, typed
+    `array.array`s, dicts of int -> int, flat lists of ints and rectangular lists
+    of int rows (move tables). The first three are stored as their size (or array
+    typecode) followed by their raw bytes, so they can be queried straight from a
+    memory-mapped file (see `map_table`).
+    """
+    if isinstance(table, PruningTable):
+        return b"P", struct.pack("<Q", table.size) + bytes(table.data)
+    if isinstance(table, StateSet):
+        return b"S", struct.pack("<Q", table.size) + bytes(table.data)
+    if isinstance(table, array):
+        return ARRAY_KIND, struct.pack("<c7x", table.typecode.encode()) + table.tobytes()
+    if isinstance(table, dict):
+        keys = array("I", table.keys())
+        values = array("B", table.values())
+        return b"D", struct.pack("<Q", len(keys)) + keys.tobytes() + values.tobytes()
+    if table and isinstance(table[0], (list, tuple)):
+        flat = array("I")
+        for row in table:
+            flat.extend(row)
+        return b"T", struct.pack("<QQ", len(table), len(table[0])) + flat.tobytes()
+    return b"L", array("I", table).tobytes()
+
+def decode_table(kind, payload):
+    if kind == ARRAY_KIND:
+        table = array(payload[:1].decode())
+        table.frombytes(payload[8:])
+        return table
+    if kind in MAPPABLE_KINDS:
+        (size,) = struct.unpack_from("<Q", payload)
+        return MAPPABLE_KINDS[kind](size, bytearray(payload[8:]))
+    if kind == b"D":
+        (n,) = struct.unpack_from("<Q", payload)
+        keys = array("I")
+        keys.frombytes(payload[8:8 + 4 * n])
+        values = array("B")
+        values.frombytes(payload[8 + 4 * n:])
+        return dict(zip(keys.tolist(), values.tolist()))
+    if kind == b"T":
+        rows, width = struct.unpack_from("<QQ", payload)
+        flat = array("I")
+        flat.frombytes(payload[16:])
+        flat = flat.tolist()
+        return [flat[i * width:(i + 1) * width] for i in range(rows)]
+    flat = array("I")
+    flat.frombytes(payload)
+    return flat.tolist()
+
+
+def _header_matches(header, name, key, payload_length):
+    magic, version, itemsize, kind, stored_digest, checksum, length = header
+    return (magic == MAGIC and version == CACHE_VERSION and itemsize == array("I").itemsize
+            and stored_digest == key_digest(name, key) and length == payload_length)
+
+def save_table(path, name, key, table):
+    kind, payload = encode_table(table)
+    header = HEADER.pack(MAGIC, CACHE_VERSION, array("I").itemsize, kind,
+                         key_digest(name, key), hashlib.sha256(payload).digest(), len(payload))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Write then rename so concurrent workers never see a partial file
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        f.write(payload)
+    os.replace(tmp_path, path)
+
+def load_table(path, name, key):
+    """Returns the cached table, or None if the file is missing, stale or corrupt."""
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    if len(data) < HEADER.size:
+        return None
+    header = HEADER.unpack_from(data)
+    kind, checksum = header[3], header[5]
+    payload = data[HEADER.size:]
+    if (not _header_matches(header, name, key, len(payload))
+            or hashlib.sha256(payload).digest() != checksum):
+        return None
+    return decode_table(kind, payload)
+
+
+def map_table(path, name, key, verify=None):
+    """
+    Memory-maps a cached PruningTable, StateSet or typed array and queries it in place.
+
+    Arrays come back as a memoryview cast to the array's typecode, which indexes
+    like the array itself.
+
+    Nothing is deserialized and only the header is checked, against the key and
+    the file length, so loading is O(1) and pages are read as lookups touch them.
+    A file damaged in place after it was written is only caught with `verify`.
+
+    Args:
+        verify (bool, optional): Also check the payload against the header
+            checksum, reading the whole file. Defaults to VERIFY_MAPPED.
+
+    Returns:
+        The table viewing the mapping, or None if the file is missing, stale,
+        corrupt or holds a table kind that cannot be mapped.
+    """
+    try:
+        with open(path, "rb") as f:
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):  # ValueError for an empty file
+        return None
+    if len(mapping) < HEADER.size + 8:
+        return None
+    header = HEADER.unpack_from(mapping)
+    kind, checksum = header[3], header[5]
+    if kind not in MAPPABLE_KINDS and kind != ARRAY_KIND:
+        return None
+    if not _header_matches(header, name, key, len(mapping) - HEADER.size):
+        return None
+    if VERIFY_MAPPED if verify is None else verify:
+        if hashlib.sha256(memoryview(mapping)[HEADER.size:]).digest() != checksum:
+            return None
+    if kind == ARRAY_KIND:
+        typecode = mapping[HEADER.size:HEADER.size + 1].decode()
+        return memoryview(mapping)[HEADER.size + 8:].cast(typecode)
+    (size,) = struct.unpack_from("<Q", mapping, HEADER.size)
+    return MAPPABLE_KINDS[kind](size, memoryview(mapping)[HEADER.size + 8:])
+
+
+def cached_table(name, key, build_fn, mapped=False):
+    """
+    Loads a table from the on-disk cache, building and storing it when missing or stale.
+
+    Args:
+        name (str): Table name, used in the cache file name.
+        key: Anything with a stable repr describing how the table is built
+            (move set, coordinate/mask and depth). A different key never
+            reuses an existing file.
+        build_fn (callable): Builds the table when the cache cannot be used.
+        mapped (bool): Memory-map the cache file instead of reading it. Only for
+            tables `map_table` supports.
+
+    Returns:
+        The loaded or freshly built table.
+    """
+    path = cache_path(name, key)
+    load = map_table if mapped else load_table
+    table = load(path, name, key)
+    if table is None:
+        global tables_built
+        tables_built += 1
+        table = build_fn()
+        try:
+            save_table(path, name, key, table)
+        except OSError:
+            return table  # Read-only location, keep the in-memory table
+        if mapped:
+            # Check what was written once, so later loads can trust the header
+            table = map_table(path, name, key, verify=True) or table
+    return table
@@ -0,0 +1,34 @@
+import random
+from timeit import default_timer
+
+import pytest
+
+import rubiks_cube_solver as solver
+from search_stats import SolveStats
+
+
+def scrambled(seed):
+    cube = solver.Cube()
+    cube.rotate(solver.get_random_scramble(solver.g0_moves, 25, random.Random(seed)))
+    return cube
+
+
+def test_g1_search_stops_at_the_deadline():
+    g0_solver, coords = solver.phase_solvers(solver.g0_table, solver.g1_table, solver.g2_table,
+                                             solver.g2_solved_states, solver.g3_table)[0]
+    cube = scrambled(0)
+    first_stats, stats = SolveStats().phase("G1"), SolveStats().phase("G1")
+    next(solver.ida_coord_solutions(g0_solver, coords(cube), solver.PHASE_DEPTH_LIMITS[0], stats=first_stats))
+
+    solutions = list(solver._g1_solutions(g0_solver, coords(cube), default_timer(), stats))
+    assert solutions
+    # The first search, then at most one deadline check interval of the second
+    assert stats.nodes <= 2 * first_stats.nodes + solver.DEADLINE_CHECK_INTERVAL
+
+@pytest.mark.parametrize("seed", range(5))
+def test_solve_anytime_keeps_to_budget(seed):
+    cube = scrambled(seed)
+    start = default_timer()
+    solution = solver.solve_anytime(cube, 0.05)
+    assert solution is not None and cube.is_solved()
+    assert default_timer() - start < 0.05 + 0.5
@@ -0,0 +1,61 @@
+import copy
+
+import pytest
+
+import benchmark
+from benchmark import compare_results
+
+
+def results():
+    case = {"solved": True, "moves": 20, "time_ms": 50.0, "nodes": 1000}
+    engine = {
+        "solved": 20,
+        "latency_ms": {"total": {"p50": 10.0, "p90": 20.0}, "phases": {}},
+        "nodes": 100000,
+        "moves": {"mean": 30.0},
+        "table_load_s": 0.1,
+        "tables_built": 0,
+        "table_build_s": 5.0,
+        "pruning_table_bytes": 1 << 20,
+        "pathological": {"superflip": dict(case), "solved": {**case, "moves": 0, "time_ms": 0.01, "nodes": 0}},
+    }
+    return {"corpus": {"name": "smoke"}, "engines": {"thistlethwaite": engine}}
+
+
+def test_unchanged_results_have_no_regressions():
+    assert compare_results(results(), results()) == []
+
+@pytest.mark.parametrize("metric, value", [
+    ("solved", False),
+    ("moves", 23),
+    ("time_ms", 80.0),
+    ("nodes", 5000),
+])
+def test_pathological_regressions_are_flagged(metric, value):
+    new = copy.deepcopy(old := results())
+    new["engines"]["thistlethwaite"]["pathological"]["superflip"][metric] = value
+    old_value = old["engines"]["thistlethwaite"]["pathological"]["superflip"][metric]
+    assert compare_results(old, new) == [("thistlethwaite", f"superflip {metric}", old_value, value)]
+
+def test_noise_on_tiny_pathological_times_is_ignored():
+    new = results()
+    new["engines"]["thistlethwaite"]["pathological"]["solved"]["time_ms"] = 0.05
+    assert compare_results(results(), new) == []
+
+def test_table_build_time_is_compared():
+    new = results()
+    new["engines"]["thistlethwaite"]["table_build_s"] = 8.0
+    assert compare_results(results(), new) == [("thistlethwaite", "table_build_s", 5.0, 8.0)]
+
+def test_load_that_built_tables_is_not_compared_with_a_cache_load():
+    new = results()
+    new["engines"]["thistlethwaite"].update(tables_built=4, table_load_s=5.0)
+    assert compare_results(results(), new) == []
+
+def test_table_build_is_measured_with_an_empty_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("RUBIKS_TABLE_CACHE", str(tmp_path))
+    build_s, built = benchmark.measure_table_build("thistlethwaite")
+    assert build_s > 0
+    assert built > 0
+    # The child's cache is its own, not the one it inherited
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,67 @@
+import itertools
+import random
+
+import pytest
+
+import rubiks_cube_solver as solver
+from coordinates import canonical_successors
+from move_maps import HTM_MOVES
+from move_sequence import compose_moves
+from two_phase import PHASE2_MOVES
+from test_pruning_tables import near_goal_states, phase_solver, true_distance
+
+MOVE_SETS = {
+    "htm": (HTM_MOVES, 3),
+    "g1": (solver.g1_moves, 3),
+    "g2": (solver.g2_moves, 5),
+    "g3": (solver.g3_moves, 5),
+    "phase 2": (PHASE2_MOVES, 3),
+}
+
+
+def positions(sequences):
+    """Lengths at which each cube position is first reached by the sequences."""
+    reached = {}
+    for sequence in sequences:
+        reached.setdefault(compose_moves(" ".join(sequence)), len(sequence))
+    return reached
+
+def canonical_sequences(moves, max_length):
+    successors = canonical_successors(tuple(moves))
+    layer = [((), len(moves))]
+    for _ in range(max_length + 1):
+        for sequence, _ in layer:
+            yield sequence
+        layer = [(sequence + (moves[m],), m) for sequence, last in layer for m in successors[last]]
+
+
+@pytest.mark.parametrize("name", MOVE_SETS)
+def test_canonical_sequences_reach_every_position_as_soon(name):
+    moves, max_length = MOVE_SETS[name]
+    every = (s for n in range(max_length + 1) for s in itertools.product(moves, repeat=n))
+    assert positions(canonical_sequences(moves, max_length)) == positions(every)
+
+def test_g2_allows_repeated_quarter_turns():
+    # U D U is the only 3 move way to U2 D, canonically U U D
+    successors = canonical_successors(tuple(solver.g2_moves))
+    u = solver.g2_moves.index("U")
+    assert u in successors[u]
+
+@pytest.mark.parametrize("scramble", ["U2 D", "U D2 L2 U"])
+def test_g2_search_finds_optimal_length(scramble):
+    # The second one takes U U U L2 U, longer without repeated quarter turns
+    g2_solver = phase_solver(2)
+    cube = solver.Cube()
+    cube.rotate(scramble)
+    coords = solver.g2_coords(cube)
+    solution = solver.solve_ida_coord(g2_solver, coords, solver.PHASE_DEPTH_LIMITS[2])
+    distance = true_distance(g2_solver, solver.coord_index(coords, g2_solver.coord_size), 8)
+    assert len(solution.split()) == distance
+
+def test_g2_search_finds_optimal_length_near_goal():
+    g2_solver = phase_solver(2)
+    rng = random.Random(10)
+    for state in near_goal_states(g2_solver, solver.g2_solved_states[0], 30, 7, rng):
+        coords = divmod(state, g2_solver.coord_size)
+        solution = solver.solve_ida_coord(g2_solver, coords, solver.PHASE_DEPTH_LIMITS[2])
+        assert len(solution.split()) == true_distance(g2_solver, state, 7)
@@ -0,0 +1,80 @@
+import random
+
+import pytest
+
+import rubiks_cube_solver
+from rubiks_cube_cubie import Cube, Thistlethwaite_Solver
+from move_sequence import parse_moves
+
+
+def scrambled(scramble):
+    cube = Cube()
+    cube.rotate(scramble)
+    return cube
+
+def random_scramble(seed):
+    return rubiks_cube_solver.get_random_scramble(rubiks_cube_solver.g0_moves, 25, random.Random(seed))
+
+def solves(scramble, solution):
+    cube = scrambled(scramble)
+    cube.rotate(" ".join(solution))
+    return cube.is_solved()
+
+
+class CountingSolver(Thistlethwaite_Solver):
+    """Records every state key the searches compute."""
+    def __init__(self, cube, max_states):
+        super().__init__(cube, max_states)
+        self.keys = set()
+
+    def cube_key(self, cube):
+        key = super().cube_key(cube)
+        self.keys.add(key)
+        return key
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_solve_returns_a_solution(seed):
+    scramble = random_scramble(seed)
+    solver = Thistlethwaite_Solver(scrambled(scramble))
+    solution = solver.solve()
+    assert solution == solver.solution
+    assert solves(scramble, solution)
+    parse_moves(" ".join(solution))  # Face turns only
+    assert len(solution) <= sum(rubiks_cube_solver.PHASE_DEPTH_LIMITS)
+
+def test_solve_leaves_the_input_cube_alone():
+    cube = scrambled("R U F' L2")
+    Thistlethwaite_Solver(cube).solve()
+    assert not cube.is_solved()
+
+def test_solve_with_bfs():
+    scramble = "R U F' L2 D"
+    solution = Thistlethwaite_Solver(scrambled(scramble)).solve(use_bfs=True)
+    assert solves(scramble, solution)
+
+def test_solve_reports_a_failed_phase():
+    assert Thistlethwaite_Solver(scrambled("F")).solve(max_depths=(0, 0, 0, 0)) is None
+
+@pytest.mark.parametrize("scramble, group", [
+    ("F", 0),             # Quarter turns of F and B flip edges
+    ("R U", 1),           # Quarter turns of L and R twist corners
+    ("U L2 R2 D'", 2),
+    ("U2 R2 F2 L2", 3),
+])
+def test_goal_groups(scramble, group):
+    solver = Thistlethwaite_Solver(Cube())
+    cube = scrambled(scramble)
+    tests = [solver.in_g1, solver.in_g2, solver.in_g3, solver.is_solved]
+    assert [test(cube) for test in tests] == [i < group for i in range(4)]
+
+def test_bfs_finds_a_shortest_solution():
+    solver = Thistlethwaite_Solver(scrambled("R U"), max_states=1000)
+    assert solver.bfs(solver.is_solved, solver.MOVES_G0) == ["U'", "R'"]
+
+def test_bfs_stops_at_max_states():
+    # Four moves away: within reach, but past far more than 1000 states
+    solver = CountingSolver(scrambled("R U F L"), max_states=1000)
+    assert solver.bfs(solver.is_solved, solver.MOVES_G0) is None
+    # Every state but the one that hit the limit was stored
+    assert len(solver.keys) <= 1001
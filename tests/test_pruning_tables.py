@@ -0,0 +1,79 @@
+import os
+import random
+import subprocess
+import sys
+
+import pytest
+
+import rubiks_cube_solver as solver
+from coordinates import N_FLIP, N_TWIST, N_SLICE, N_M_SLICE, N_CORNER_PERM, N_G3_CORNER_PERM, N_SLICE_PERM
+from pruning_table import inverse_move_tables
+
+# Coordinate space of each phase
+PHASE_SIZES = (N_FLIP, N_TWIST * N_SLICE, N_M_SLICE * N_CORNER_PERM, N_G3_CORNER_PERM * N_SLICE_PERM)
+
+
+def phase_solver(phase):
+    return solver.phase_solvers(solver.g0_table, solver.g1_table, solver.g2_table,
+                                solver.g2_solved_states, solver.g3_table)[phase][0]
+
+def successors(phase_solver, state):
+    x, y = divmod(state, phase_solver.coord_size)
+    x_table, y_table = phase_solver.move_tables
+    return {x_row[x] * phase_solver.coord_size + y_row[y] for x_row, y_row in zip(x_table, y_table)}
+
+def true_distance(phase_solver, state, max_depth):
+    """Moves from a state to the phase goal by breadth-first search, None beyond max_depth."""
+    frontier, seen = {state}, {state}
+    for depth in range(max_depth + 1):
+        if any(phase_solver.is_solved(s) for s in frontier):
+            return depth
+        frontier = {t for s in frontier for t in successors(phase_solver, s)} - seen
+        seen |= frontier
+    return None
+
+def near_goal_states(phase_solver, goal, count, max_depth, rng):
+    """States at most max_depth moves from the goal, reached by walking the inverse moves."""
+    x_table, y_table = inverse_move_tables(phase_solver.move_tables)
+    states = []
+    for _ in range(count):
+        x, y = divmod(goal, phase_solver.coord_size)
+        for _ in range(rng.randint(0, max_depth)):
+            m = rng.randrange(len(x_table))
+            x, y = x_table[m][x], y_table[m][y]
+        states.append(x * phase_solver.coord_size + y)
+    return states
+
+
+def test_g2_table_matches_brute_force_distances():
+    g2_solver = phase_solver(2)
+    rng = random.Random(4)
+    max_depth = 6
+    for state in near_goal_states(g2_solver, solver.g2_solved_states[0], 40, max_depth, rng):
+        distance = true_distance(g2_solver, state, max_depth)
+        assert distance is not None
+        assert g2_solver.pruning_table.get(state, g2_solver.pruning_depth + 1) == distance
+
+@pytest.mark.parametrize("phase", range(len(PHASE_SIZES)))
+def test_table_entries_are_consistent_distances(phase):
+    # A distance table holds 0 exactly on goal states, and every other known
+    # entry is one more than the smallest entry among its successors
+    phase_solver_ = phase_solver(phase)
+    table, default = phase_solver_.pruning_table, phase_solver_.pruning_depth + 1
+    rng = random.Random(phase)
+    for state in (rng.randrange(PHASE_SIZES[phase]) for _ in range(2000)):
+        distance = table.get(state, default)
+        nearest = min(table.get(s, default) for s in successors(phase_solver_, state))
+        if distance == 0:
+            assert phase_solver_.is_solved(state)
+        elif distance < default:
+            assert nearest == distance - 1
+        else:
+            assert nearest >= default - 1
+
+def test_warm_import_does_not_load_numpy():
+    # Tables come from the cache, so importing the solver must not pay for NumPy
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code = "import sys, rubiks_cube_solver; print('numpy' in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True, check=True)
+    assert result.stdout.strip().splitlines()[-1] == "False"
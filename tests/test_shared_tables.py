@@ -0,0 +1,93 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import shared_tables
+import table_cache
+from pruning_table import PruningTable
+
+pytestmark = pytest.mark.skipif(not os.path.isdir(shared_tables.SHM_DIR), reason="needs POSIX shared memory")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(table_cache, "CACHE_DIR", str(tmp_path))
+    return tmp_path
+
+@pytest.fixture
+def key(request):
+    # A key of its own per test, so no test sees another's (or a solver's) blocks
+    key = ("test", request.node.name, os.getpid())
+    yield key
+    shared_tables.unlink_table("test_table", key)
+
+def build_table():
+    table = PruningTable(1000)
+    for state in range(0, 1000, 3):
+        table[state] = state % 15
+    return table
+
+def block_exists(key):
+    return os.path.exists(os.path.join(shared_tables.SHM_DIR, shared_tables.block_name("test_table", key)))
+
+def dead_pid():
+    result = subprocess.run([sys.executable, "-c", "import os; print(os.getpid())"],
+                            capture_output=True, text=True, check=True)
+    return int(result.stdout)
+
+def leave_block(key, ready, pid):
+    # A block as a publisher would leave it, without registering it with this process
+    block = shared_tables.block_name("test_table", key)
+    table = build_table()
+    shm = shared_tables._open_block(block, create=True, size=shared_tables.BLOCK_HEADER.size + len(table.data))
+    shm.buf[shared_tables.BLOCK_HEADER.size:] = table.data
+    shared_tables.BLOCK_HEADER.pack_into(shm.buf, 0, ready, pid, table.size)
+    shm.close()
+
+
+def test_publisher_unlinks_its_blocks_on_exit(cache_dir, key):
+    code = ("import sys, shared_tables, table_cache; from tests.test_shared_tables import build_table; "
+            f"table_cache.CACHE_DIR = sys.argv[1]; shared_tables.shared_table('test_table', {key!r}, build_table); "
+            "print(shared_tables.block_name('test_table', " + repr(key) + ") in shared_tables._owned)")
+    result = subprocess.run([sys.executable, "-c", code, str(cache_dir)], cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "True"
+    assert not block_exists(key)
+
+def test_attaching_process_does_not_unlink(cache_dir, key):
+    table = shared_tables.shared_table("test_table", key, build_table)
+    code = ("import shared_tables; "
+            f"assert shared_tables.attach_table('test_table', {key!r}) is not None")
+    subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True)
+    assert block_exists(key)
+    assert bytes(table.data) == bytes(build_table().data)
+
+@pytest.mark.parametrize("owner", ["dead", "alive"])
+def test_unfinished_block_falls_back_to_the_cache(cache_dir, key, monkeypatch, owner):
+    monkeypatch.setattr(shared_tables, "ATTACH_TIMEOUT", 0.05)
+    leave_block(key, 0, dead_pid() if owner == "dead" else os.getpid())
+    table = shared_tables.shared_table("test_table", key, build_table)
+    assert bytes(table.data) == bytes(build_table().data)
+    assert not block_exists(key)
+
+def test_orphaned_block_is_adopted(cache_dir, key):
+    leave_block(key, 1, dead_pid())
+    table = shared_tables.attach_table("test_table", key)
+    assert bytes(table.data) == bytes(build_table().data)
+    assert shared_tables._owned[shared_tables.block_name("test_table", key)] == os.getpid()
+
+def test_unlink_orphaned_blocks_keeps_live_ones(key):
+    live_key = key + ("live",)
+    leave_block(key, 1, dead_pid())
+    leave_block(live_key, 1, os.getpid())
+    try:
+        removed = shared_tables.unlink_orphaned_blocks()
+        assert shared_tables.block_name("test_table", key) in removed
+        assert not block_exists(key)
+        assert block_exists(live_key)
+    finally:
+        shared_tables.unlink_table("test_table", live_key)
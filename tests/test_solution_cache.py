@@ -0,0 +1,60 @@
+import random
+
+import pytest
+
+import rubiks_cube_solver as solver
+from solution_cache import SolutionCache
+from symmetry import SYMMETRIES, conjugate_facelets
+
+
+def scrambled(seed):
+    cube = solver.Cube()
+    cube.rotate(solver.get_random_scramble(solver.g0_moves, 25, random.Random(seed)))
+    return "".join(cube.state)
+
+def solves(state, solution):
+    cube = solver.Cube(state)
+    cube.rotate(solution)
+    return cube.is_solved()
+
+def solve(state):
+    cube = solver.Cube(state)
+    return solver.solve_cube(cube)
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_normalized_solution_solves_every_conjugate(seed):
+    state = scrambled(seed)
+    cache = SolutionCache(normalize=True)
+    cache.put(state, solve(state))
+    for sym in range(len(SYMMETRIES)):
+        conjugate = conjugate_facelets(state, sym)
+        solution = cache.get(conjugate)
+        assert solution is not None, sym
+        assert solves(conjugate, solution), sym
+    assert len(cache) == 1
+
+@pytest.mark.parametrize("sym", range(len(SYMMETRIES)))
+def test_solution_stored_from_a_conjugate_solves_the_original(sym):
+    state = scrambled(4)
+    conjugate = conjugate_facelets(state, sym)
+    cache = SolutionCache(normalize=True)
+    cache.put(conjugate, solve(conjugate))
+    assert solves(state, cache.get(state))
+
+def test_save_and_load_keep_entries(tmp_path):
+    path = str(tmp_path / "solutions.json")
+    cache = SolutionCache(normalize=True, path=path)
+    state = scrambled(5)
+    cache.put(state, solve(state))
+    cache.save()
+    loaded = SolutionCache(normalize=True, path=path)
+    assert solves(state, loaded.get(state))
+    assert len(SolutionCache(path=path)) == 0  # Saved with another normalize setting
+
+def test_save_without_a_path_is_an_error():
+    cache = SolutionCache()
+    with pytest.raises(ValueError, match="No cache file"):
+        cache.save()
+    with pytest.raises(ValueError, match="No cache file"):
+        cache.load()
@@ -0,0 +1,66 @@
+import itertools
+import multiprocessing
+import random
+import time
+
+import pytest
+
+import rubiks_cube_solver as solver
+from solution_cache import SolutionCache
+
+
+def scrambles(seed):
+    rng = random.Random(seed)
+    while True:
+        yield solver.get_random_scramble(solver.g0_moves, 25, rng)
+
+def is_solution(scramble, solution):
+    cube = solver.Cube()
+    cube.rotate(scramble)
+    cube.rotate(solution)
+    return cube.is_solved()
+
+def slow_first_job(job, engine="thistlethwaite", time_budget=1.0):
+    index, scramble = job
+    time.sleep(1.0 if index == 0 else 0.01)
+    return index, scramble, "", 0.0
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_solve_many_solves_every_scramble(workers):
+    inputs = list(itertools.islice(scrambles(1), 10))
+    results = sorted(solver.solve_many(inputs, workers=workers, chunksize=2))
+    assert [index for index, _, _, _ in results] == list(range(len(inputs)))
+    for _, scramble, solution, _ in results:
+        assert is_solution(scramble, solution)
+
+def test_solve_many_reads_input_lazily():
+    read = 0
+
+    def counted(source):
+        nonlocal read
+        for scramble in source:
+            read += 1
+            yield scramble
+
+    results = solver.solve_many(counted(scrambles(2)), workers=2, chunksize=1)
+    for _ in range(3):
+        next(results)
+    results.close()
+    # The window of chunks in flight, plus one read to replace each finished chunk
+    assert read <= solver.IN_FLIGHT_CHUNKS * 2 + 3
+
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="workers must inherit the patch")
+def test_slow_scramble_does_not_hold_up_the_rest(monkeypatch):
+    monkeypatch.setattr(solver, "_solve_job", slow_first_job)
+    order = [index for index, _, _, _ in solver.solve_many(["R"] * 40, workers=2, chunksize=1)]
+    # The other worker keeps reading new scrambles while the first one is stuck
+    assert order.index(0) > 30
+
+def test_solve_many_answers_repeats_from_cache():
+    inputs = list(itertools.islice(scrambles(3), 5))
+    cache = SolutionCache()
+    first = {index: solution for index, _, solution, _ in solver.solve_many(inputs, workers=1, cache=cache)}
+    second = {index: solution for index, _, solution, _ in solver.solve_many(inputs, workers=1, cache=cache)}
+    assert first == second
+    assert cache.hits == len(inputs)
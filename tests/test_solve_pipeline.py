@@ -0,0 +1,64 @@
+import pytest
+
+import rubiks_cube_solver as solver
+from coordinates import cubie_to_facelets
+from solve_pipeline import parse_cube, solve_line
+
+SOLVED = "".join(solver.Cube().state)
+
+
+def facelets(scramble):
+    cube = solver.Cube()
+    cube.rotate(scramble)
+    return "".join(cube.state)
+
+def broken(cp=tuple(range(8)), co=(0,) * 8, ep=tuple(range(12)), eo=(0,) * 12):
+    return cubie_to_facelets((list(cp), list(co), list(ep), list(eo)))
+
+def swap(state, i, j):
+    state = list(state)
+    state[i], state[j] = state[j], state[i]
+    return "".join(state)
+
+
+def test_scrambles_and_facelets_give_the_same_cube():
+    scramble = "R U2 F' L D B2"
+    assert parse_cube(scramble).state == parse_cube(facelets(scramble)).state
+
+@pytest.mark.parametrize("state", [
+    swap(SOLVED, 4, 49),                                     # U and D centres swapped
+    "".join({"U": "D", "D": "U"}.get(c, c) for c in SOLVED),  # U and D recoloured
+    swap(facelets("R U"), 4, 13),                             # L and U centres swapped
+])
+def test_misplaced_centres_are_rejected(state):
+    with pytest.raises(ValueError, match="Centres"):
+        parse_cube(state)
+    assert "error" in solve_line((1, state))
+
+@pytest.mark.parametrize("state, message", [
+    (broken(co=(1,) + (0,) * 7), "twists"),
+    (broken(eo=(1,) + (0,) * 11), "flips"),
+    (broken(ep=(1, 0) + tuple(range(2, 12))), "parities"),
+])
+def test_unsolvable_facelets_are_rejected(state, message):
+    with pytest.raises(ValueError, match=message):
+        parse_cube(state)
+
+@pytest.mark.parametrize("line", ["R U X2", "M2 U", "E2", "S", "r", "u2 R", "Rw"])
+def test_moves_other_than_face_turns_are_rejected(line):
+    with pytest.raises(ValueError, match="Unknown move"):
+        parse_cube(line)
+    record = solve_line((1, line))
+    assert "Unknown move" in record["error"]
+    assert "solution" not in record
+
+@pytest.mark.parametrize("line", [SOLVED, "R R'"])
+def test_solved_cube_counts_no_moves(line):
+    record = solve_line((1, line))
+    assert record["solution"].split() == []
+    assert record["moves"] == 0
+
+def test_thistlethwaite_counts_no_moves_for_a_solved_cube():
+    tables = (solver.g0_table, solver.g1_table, solver.g2_table, solver.g2_solved_states, solver.g3_table)
+    _, moves = solver.thistlethwaite(*tables, scramble="")
+    assert moves == 0
@@ -0,0 +1,68 @@
+import hashlib
+import os
+
+import pytest
+
+import table_cache
+from pruning_table import PruningTable
+
+KEY = ("test", 1)
+_sha256 = hashlib.sha256
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(table_cache, "CACHE_DIR", str(tmp_path))
+    return tmp_path
+
+def build_table():
+    table = PruningTable(1000)
+    for state in range(0, 1000, 3):
+        table[state] = state % 15
+    return table
+
+def load(builds):
+    def build():
+        builds.append(1)
+        return build_table()
+    return table_cache.cached_table("test_table", KEY, build, mapped=True)
+
+
+def test_mapped_table_is_reused(cache_dir):
+    builds = []
+    load(builds)
+    table = load(builds)
+    assert len(builds) == 1
+    assert bytes(table.data) == bytes(build_table().data)
+
+@pytest.mark.parametrize("damage", ["flip", "truncate"])
+def test_damaged_mapped_table_is_rebuilt(cache_dir, monkeypatch, damage):
+    builds = []
+    load(builds)
+    path = table_cache.cache_path("test_table", KEY)
+    with open(path, "r+b") as f:
+        if damage == "flip":
+            f.seek(-1, os.SEEK_END)
+            byte = f.read(1)
+            f.seek(-1, os.SEEK_END)
+            f.write(bytes([byte[0] ^ 0xFF]))
+        else:
+            f.truncate(os.path.getsize(path) - 10)
+
+    assert table_cache.map_table(path, "test_table", KEY, verify=True) is None
+    if damage == "flip":
+        # Only the header and length are checked unless asked to verify
+        assert table_cache.map_table(path, "test_table", KEY) is not None
+        monkeypatch.setattr(table_cache, "VERIFY_MAPPED", True)
+    table = load(builds)
+    assert len(builds) == 2
+    assert bytes(table.data) == bytes(build_table().data)
+
+def test_mapped_load_does_not_hash_the_payload(cache_dir, monkeypatch):
+    load([])
+    hashed = []
+    monkeypatch.setattr(table_cache.hashlib, "sha256", lambda data=b"": hashed.append(len(data)) or _sha256(data))
+    path = table_cache.cache_path("test_table", KEY)
+    assert table_cache.map_table(path, "test_table", KEY) is not None
+    # Only the key digest is hashed, never the payload
+    assert os.path.getsize(path) - table_cache.HEADER.size not in hashed
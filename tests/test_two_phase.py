@@ -0,0 +1,66 @@
+import random
+
+import pytest
+
+from coordinates import (
+    SOLVED_STATE, facelets_to_cubie, apply_moves, get_edge4_perm, get_slice, get_ud_edge_perm,
+    get_e_slice_perm, U_EDGES, D_EDGES, E_SLICE_EDGES, N_EDGE4_PERM
+)
+from move_maps import HTM_MOVES
+from rubiks_cube_solver import Cube
+from two_phase import MAX_LENGTH, PHASE2_MOVES, load_tables, solve_two_phase, two_phase_solutions
+
+SOLVED = facelets_to_cubie(SOLVED_STATE)
+
+
+def random_moves(rng, moves, length):
+    return " ".join(rng.choice(moves) for _ in range(length))
+
+def facelets(scramble):
+    cube = Cube()
+    cube.rotate(scramble)
+    return cube.state
+
+
+def test_edge4_perm_follows_its_move_table():
+    tables = load_tables()
+    rng = random.Random(1)
+    for _ in range(100):
+        cubie = SOLVED
+        coords = [get_edge4_perm(SOLVED[2], edges) for edges in (U_EDGES, D_EDGES, E_SLICE_EDGES)]
+        for move in random_moves(rng, HTM_MOVES, 12).split():
+            cubie = apply_moves(cubie, move)
+            coords = [tables.edge4_moves[HTM_MOVES.index(move)][c] for c in coords]
+        assert coords == [get_edge4_perm(cubie[2], edges) for edges in (U_EDGES, D_EDGES, E_SLICE_EDGES)]
+
+def test_edge4_perms_give_phase2_coordinates():
+    tables = load_tables()
+    rng = random.Random(2)
+    for _ in range(100):
+        ep = apply_moves(SOLVED, random_moves(rng, PHASE2_MOVES, 15))[2]
+        u, d, e = (get_edge4_perm(ep, edges) for edges in (U_EDGES, D_EDGES, E_SLICE_EDGES))
+        assert tables.ud_edge_merge[u * N_EDGE4_PERM + d] == get_ud_edge_perm(ep)
+        assert divmod(e, 24) == (get_slice(ep), get_e_slice_perm(ep))
+
+@pytest.mark.parametrize("seed", range(5))
+def test_solutions_solve_and_shorten(seed):
+    cubie = apply_moves(SOLVED, random_moves(random.Random(seed), HTM_MOVES, 25))
+    lengths = []
+    for solution in two_phase_solutions(cubie, deadline=0):
+        assert apply_moves(cubie, solution) == SOLVED
+        lengths.append(len(solution.split()))
+    assert lengths and lengths == sorted(set(lengths), reverse=True)
+
+def test_superflip():
+    scramble = "U R2 F B R B2 R U2 L B2 R U' D' R2 F R' L B2 U2 F2"
+    solution = solve_two_phase(facelets(scramble), time_budget=0.2)
+    assert apply_moves(apply_moves(SOLVED, scramble), solution) == SOLVED
+    assert len(solution.split()) <= MAX_LENGTH
+
+def test_solved_cube():
+    assert solve_two_phase(SOLVED_STATE) == ""
+
+def test_target_length_stops_early():
+    scramble = random_moves(random.Random(7), HTM_MOVES, 25)
+    solution = solve_two_phase(facelets(scramble), time_budget=30, target_length=24)
+    assert len(solution.split()) <= 24
@@ -0,0 +1,371 @@
+from timeit import default_timer
+from functools import lru_cache
+from contextlib import nullcontext
+from move_maps import HTM_MOVES
+from coordinates import (
+    SOLVED_STATE, facelets_to_cubie, canonical_successors, get_twist, get_flip, get_slice,
+    get_corner_perm, get_ud_edge_perm, get_e_slice_perm, get_edge4_perm, twist_move_table,
+    flip_move_table, slice_move_table, corner_perm_move_table, ud_edge_perm_move_table,
+    e_slice_perm_move_table, edge4_perm_move_table, ud_edge_perm_merge_table, U_EDGES, D_EDGES,
+    E_SLICE_EDGES, N_TWIST, N_FLIP, N_SLICE, N_CORNER_PERM, N_UD_EDGE_PERM, N_E_SLICE_PERM, N_EDGE4_PERM
+)
+from table_cache import cached_table
+from pruning_table import UNKNOWN, MAX_DEPTH, gen_coord_pruning_table
+
+PHASE1_MOVES = HTM_MOVES
+# Moves that keep the cube in the phase 1 target group <U, D, F2, B2, L2, R2>
+PHASE2_MOVES = ["U", "U'", "U2", "D", "D'", "D2", "F2", "B2", "L2", "R2"]
+PHASE2_MAX_DEPTH = 12
+# Longest solution searched for; every later solution is shorter than the last
+MAX_LENGTH = 30
+# Nodes searched between deadline checks
+DEADLINE_CHECK_INTERVAL = 1024
+
+
+class TwoPhaseTables:
+    """
+    Move and pruning tables of both phases, loaded from the table cache.
+
+    Phase 1 bounds the distance to <U, D, F2, B2, L2, R2> by twist x UD-slice and
+    flip x UD-slice, phase 2 the distance to solved by corner perm x E-slice perm
+    and U/D edge perm x E-slice perm. All four tables are complete (exact).
+
+    Phase 1 also carries the corner perm and the `get_edge4_perm` of the U, D and
+    E-slice edges, from which each phase 1 solution's phase 2 coordinates are read
+    (the U and D edges through `ud_edge_merge`).
+    """
+    def __init__(self):
+        self.twist_moves = cached_table("twist_moves", PHASE1_MOVES, lambda: twist_move_table(PHASE1_MOVES))
+        self.flip_moves = cached_table("flip_moves", PHASE1_MOVES, lambda: flip_move_table(PHASE1_MOVES))
+        self.slice_moves = cached_table("slice_moves", PHASE1_MOVES, lambda: slice_move_table(PHASE1_MOVES))
+        self.phase1_corner_moves = cached_table(
+            "corner_perm_moves", PHASE1_MOVES, lambda: corner_perm_move_table(PHASE1_MOVES))
+        self.edge4_moves = cached_table("edge4_perm_moves", PHASE1_MOVES, lambda: edge4_perm_move_table(PHASE1_MOVES))
+        self.ud_edge_merge = {
+            pair: index for index, pair in enumerate(cached_table("ud_edge_perm_merge", "u x d edge4 perms",
+                                                                  ud_edge_perm_merge_table))
+        }
+        self.corner_moves = cached_table(
+            "corner_perm_moves", PHASE2_MOVES, lambda: corner_perm_move_table(PHASE2_MOVES))
+        self.ud_edge_moves = cached_table(
+            "ud_edge_perm_moves", PHASE2_MOVES, lambda: ud_edge_perm_move_table(PHASE2_MOVES))
+        self.e_slice_moves = cached_table(
+            "e_slice_perm_moves", PHASE2_MOVES, lambda: e_slice_perm_move_table(PHASE2_MOVES))
+
+        cp, co, ep, eo = facelets_to_cubie(SOLVED_STATE)
+        solved_slice, solved_e_slice = get_slice(ep), get_e_slice_perm(ep)
+        self.twist_slice = cached_table(
+            "two_phase_twist_slice", ("twist x slice", PHASE1_MOVES, MAX_DEPTH),
+            lambda: gen_coord_pruning_table([get_twist(co) * N_SLICE + solved_slice], MAX_DEPTH,
+                                            (self.twist_moves, self.slice_moves), N_SLICE, N_TWIST * N_SLICE),
+            mapped=True
+        )
+        self.flip_slice = cached_table(
+            "two_phase_flip_slice", ("flip x slice", PHASE1_MOVES, MAX_DEPTH),
+            lambda: gen_coord_pruning_table([get_flip(eo) * N_SLICE + solved_slice], MAX_DEPTH,
+                                            (self.flip_moves, self.slice_moves), N_SLICE, N_FLIP * N_SLICE),
+            mapped=True
+        )
+        self.corner_e_slice = cached_table(
+            "two_phase_corner_e_slice", ("corner perm x e slice perm", PHASE2_MOVES, MAX_DEPTH),
+            lambda: gen_coord_pruning_table([get_corner_perm(cp) * N_E_SLICE_PERM + solved_e_slice],
+                                            MAX_DEPTH, (self.corner_moves, self.e_slice_moves),
+                                            N_E_SLICE_PERM, N_CORNER_PERM * N_E_SLICE_PERM),
+            mapped=True
+        )
+        self.edge_e_slice = cached_table(
+            "two_phase_edge_e_slice", ("ud edge perm x e slice perm", PHASE2_MOVES, MAX_DEPTH),
+            lambda: gen_coord_pruning_table([get_ud_edge_perm(ep) * N_E_SLICE_PERM + solved_e_slice],
+                                            MAX_DEPTH, (self.ud_edge_moves, self.e_slice_moves),
+                                            N_E_SLICE_PERM, N_UD_EDGE_PERM * N_E_SLICE_PERM),
+            mapped=True
+        )
+
+@lru_cache(maxsize=None)
+def load_tables():
+    """Loads the two-phase tables on first use, so importing the module stays cheap."""
+    return TwoPhaseTables()
+
+
+def _phase2_first_moves():
+    """Phase 2 moves allowed right after each phase 1 move (and, last, after no move at all)."""
+    successors = canonical_successors(tuple(PHASE1_MOVES))
+    first_moves = []
+    for allowed in successors:
+        allowed = {PHASE1_MOVES[i] for i in allowed}
+        first_moves.append([i for i, move in enumerate(PHASE2_MOVES) if move in allowed])
+    return first_moves
+
+# A phase 1 solution ending in a phase 2 move is a shorter phase 1 solution followed
+# by a longer phase 2, which the search reaches anyway
+_ENDS_PHASE1 = [move not in PHASE2_MOVES for move in PHASE1_MOVES]
+
+
+def search_phase2(tables, corner, edge, e_slice, first_moves, depth_limit, deadline=None, stats=None):
+    """
+    IDA* within <U, D, F2, B2, L2, R2> for the shortest solution of a phase 2 position.
+
+    Args:
+        tables (TwoPhaseTables): Loaded tables.
+        corner, edge, e_slice (int): Corner perm, U/D edge perm and E-slice perm coordinates.
+        first_moves (list): Indices of the phase 2 moves allowed first.
+        depth_limit (int): Longest solution to search for.
+        deadline (float, optional): default_timer() value at which to give up.
+        stats (SearchStats, optional): Counters the search adds to.
+
+    Returns:
+        list: Phase 2 move indices of the solution, or None if there is none within
+              depth_limit (or the deadline passed).
+    """
+    corner_moves, edge_moves, e_slice_moves = tables.corner_moves, tables.ud_edge_moves, tables.e_slice_moves
+    corner_data, edge_data = tables.corner_e_slice.data, tables.edge_e_slice.data
+    successors = canonical_successors(tuple(PHASE2_MOVES))
+
+    a = corner * N_E_SLICE_PERM + e_slice
+    b = edge * N_E_SLICE_PERM + e_slice
+    bound = max((corner_data[a >> 1] >> ((a & 1) << 2)) & 15, (edge_data[b >> 1] >> ((b & 1) << 2)) & 15)
+    # Both projections are solved only when the whole phase 2 position is
+    if bound == 0:
+        return []
+
+    corners = [corner] * (depth_limit + 1)
+    edges = [edge] * (depth_limit + 1)
+    e_slices = [e_slice] * (depth_limit + 1)
+    candidates = [first_moves] * (depth_limit + 1)
+    next_move = [0] * (depth_limit + 1)
+    path = [0] * depth_limit
+    nodes = misses = prunes = 0
+
+    while bound <= depth_limit:
+        if stats is not None:
+            stats.iteration(bound)
+        next_bound = depth_limit + 1
+        depth = 0
+        candidates[0] = first_moves
+        next_move[0] = 0
+        while depth >= 0:
+            i = next_move[depth]
+            if i == len(candidates[depth]):
+                depth -= 1
+                continue
+            next_move[depth] = i + 1
+            m = candidates[depth][i]
+
+            nodes += 1
+            if deadline is not None and nodes % DEADLINE_CHECK_INTERVAL == 0 and default_timer() > deadline:
+                if stats is not None:
+                    stats.add(nodes, misses, prunes)
+                return None
+
+            # The edges are only moved once the corner bound alone does not prune the node;
+            # an unknown entry (15) reads as its MAX_DEPTH + 1 lower bound
+            corner = corner_moves[m][corners[depth]]
+            e_slice = e_slice_moves[m][e_slices[depth]]
+            a = corner * N_E_SLICE_PERM + e_slice
+            lower_bound = (corner_data[a >> 1] >> ((a & 1) << 2)) & 15
+            f = depth + 1 + lower_bound
+            if f > bound:
+                prunes += 1
+                if f < next_bound:
+                    next_bound = f
+                continue
+            edge = edge_moves[m][edges[depth]]
+            b = edge * N_E_SLICE_PERM + e_slice
+            edge_bound = (edge_data[b >> 1] >> ((b & 1) << 2)) & 15
+            if edge_bound > lower_bound:
+                lower_bound = edge_bound
+            if lower_bound == 0:
+                path[depth] = m
+                if stats is not None:
+                    stats.add(nodes, misses, prunes)
+                return path[:depth + 1]
+            if lower_bound == UNKNOWN:
+                misses += 1
+            f = depth + 1 + lower_bound
+            if f > bound:
+                prunes += 1
+                if f < next_bound:
+                    next_bound = f
+                continue
+
+            path[depth] = m
+            depth += 1
+            corners[depth] = corner
+            edges[depth] = edge
+            e_slices[depth] = e_slice
+            candidates[depth] = successors[m]
+            next_move[depth] = 0
+        bound = next_bound
+    if stats is not None:
+        stats.add(nodes, misses, prunes)
+    return None
+
+
+def two_phase_solutions(cubie, deadline=None, target_length=None, max_length=MAX_LENGTH, stats=None):
+    """
+    Yields ever shorter solutions of a cubie state with Kociemba's two-phase algorithm.
+
+    Phase 1 walks every move sequence of length 0, 1, 2, ... that brings the cube
+    into <U, D, F2, B2, L2, R2> (twist, flip and UD-slice solved). Phase 2 then
+    solves each such position within that group, limited so that the total length
+    beats the best solution so far. The search ends once phase 1 alone is as long
+    as the best solution.
+
+    Args:
+        cubie (tuple): (cp, co, ep, eo) state to solve.
+        deadline (float, optional): default_timer() value after which the search stops;
+            it always runs until it has a first solution.
+        target_length (int, optional): Stop at the first solution this short.
+        max_length (int): Longest solution to accept.
+        stats (SolveStats, optional): Counters of the "phase 1" search and of the
+            "phase 2" searches, which are also timed.
+
+    Yields:
+        str: Each solution found, every one shorter than the last.
+    """
+    tables = load_tables()
+    twist_moves, flip_moves, slice_moves = tables.twist_moves, tables.flip_moves, tables.slice_moves
+    corner_moves, edge4_moves, ud_edge_merge = tables.phase1_corner_moves, tables.edge4_moves, tables.ud_edge_merge
+    twist_data, flip_data = tables.twist_slice.data, tables.flip_slice.data
+    successors = canonical_successors(tuple(PHASE1_MOVES))
+    # The last phase 1 move is never a phase 2 move, so those are not even tried there
+    last_successors = [[m for m in allowed if _ENDS_PHASE1[m]] for allowed in successors]
+    phase2_first_moves = _phase2_first_moves()
+
+    cp, co, ep, eo = cubie
+    twist, flip, slice_ = get_twist(co), get_flip(eo), get_slice(ep)
+    corner = get_corner_perm(cp)
+    u_edge, d_edge, e_edge = (get_edge4_perm(ep, edges) for edges in (U_EDGES, D_EDGES, E_SLICE_EDGES))
+    a = twist * N_SLICE + slice_
+    b = flip * N_SLICE + slice_
+    phase1_bound = max((twist_data[a >> 1] >> ((a & 1) << 2)) & 15, (flip_data[b >> 1] >> ((b & 1) << 2)) & 15)
+
+    best_length = max_length + 1
+    nodes = prunes = 0
+    phase1_stats = stats.phase("phase 1") if stats is not None else None
+
+    def phase2(path, first_moves, corner, u_edge, d_edge, e_edge):
+        # In phase 2 the U and D edges fill the U/D layers and the E-slice edges the E slice
+        with stats.timed("phase 2") if stats is not None else nullcontext() as phase2_stats:
+            solution = search_phase2(
+                tables, corner, ud_edge_merge[u_edge * N_EDGE4_PERM + d_edge], e_edge % N_E_SLICE_PERM,
+                first_moves, min(best_length - 1 - len(path), PHASE2_MAX_DEPTH),
+                deadline if best_length <= max_length else None, phase2_stats
+            )
+        if solution is None:
+            return None
+        return " ".join([PHASE1_MOVES[m] for m in path] + [PHASE2_MOVES[m] for m in solution])
+
+    if phase1_bound == 0:
+        solution = phase2([], phase2_first_moves[-1], corner, u_edge, d_edge, e_edge)
+        if solution is not None:
+            best_length = len(solution.split())
+            yield solution
+
+    for d1 in range(max(phase1_bound, 1), max_length + 1):
+        if d1 >= best_length or (target_length is not None and best_length <= target_length):
+            return
+        if phase1_stats is not None:
+            phase1_stats.iteration(d1)
+
+        twists = [twist] * (d1 + 1)
+        flips = [flip] * (d1 + 1)
+        slices = [slice_] * (d1 + 1)
+        # Phase 2 coordinates, only moved along for the nodes that are not pruned
+        corners = [corner] * (d1 + 1)
+        u_edges = [u_edge] * (d1 + 1)
+        d_edges = [d_edge] * (d1 + 1)
+        e_edges = [e_edge] * (d1 + 1)
+        candidates = [successors[-1] if d1 > 1 else last_successors[-1]] * (d1 + 1)
+        next_move = [0] * (d1 + 1)
+        path = [0] * d1
+        depth = 0
+        while depth >= 0:
+            i = next_move[depth]
+            if i == len(candidates[depth]):
+                depth -= 1
+                continue
+            next_move[depth] = i + 1
+            m = candidates[depth][i]
+
+            nodes += 1
+            if (nodes % DEADLINE_CHECK_INTERVAL == 0 and deadline is not None and best_length <= max_length
+                    and default_timer() > deadline):
+                if phase1_stats is not None:
+                    phase1_stats.add(nodes, prunes=prunes)
+                return
+
+            # Either table's bound alone prunes most nodes, so flip is only moved if twist passes
+            togo = d1 - depth - 1
+            new_twist = twist_moves[m][twists[depth]]
+            new_slice = slice_moves[m][slices[depth]]
+            a = new_twist * N_SLICE + new_slice
+            if (twist_data[a >> 1] >> ((a & 1) << 2)) & 15 > togo:
+                prunes += 1
+                continue
+            new_flip = flip_moves[m][flips[depth]]
+            b = new_flip * N_SLICE + new_slice
+            if (flip_data[b >> 1] >> ((b & 1) << 2)) & 15 > togo:
+                prunes += 1
+                continue
+
+            path[depth] = m
+            if togo == 0:
+                edge4_row = edge4_moves[m]
+                solution = phase2(path, phase2_first_moves[m], corner_moves[m][corners[depth]],
+                                  edge4_row[u_edges[depth]], edge4_row[d_edges[depth]], edge4_row[e_edges[depth]])
+                if solution is not None:
+                    best_length = len(solution.split())
+                    if phase1_stats is not None:
+                        phase1_stats.add(nodes, prunes=prunes)
+                        nodes = prunes = 0
+                    yield solution
+                    if d1 >= best_length or (target_length is not None and best_length <= target_length):
+                        return
+                if deadline is not None and best_length <= max_length and default_timer() > deadline:
+                    if phase1_stats is not None:
+                        phase1_stats.add(nodes, prunes=prunes)
+                    return
+                continue
+
+            edge4_row = edge4_moves[m]
+            corners[depth + 1] = corner_moves[m][corners[depth]]
+            u_edges[depth + 1] = edge4_row[u_edges[depth]]
+            d_edges[depth + 1] = edge4_row[d_edges[depth]]
+            e_edges[depth + 1] = edge4_row[e_edges[depth]]
+            depth += 1
+            twists[depth] = new_twist
+            flips[depth] = new_flip
+            slices[depth] = new_slice
+            candidates[depth] = last_successors[m] if togo == 1 else successors[m]
+            next_move[depth] = 0
+        if phase1_stats is not None:
+            phase1_stats.add(nodes, prunes=prunes)
+            nodes = prunes = 0
+
+
+def solve_two_phase(cube_state, time_budget=1.0, target_length=None, max_length=MAX_LENGTH, stats=None):
+    """
+    Solves a facelet state, searching for shorter solutions until the time budget runs out.
+
+    Args:
+        cube_state (str or list): Facelet colours in the layout of `Cube.state`.
+        time_budget (float): Seconds to keep improving once a solution is found.
+        target_length (int, optional): Return as soon as a solution is this short.
+        max_length (int): Longest solution to accept.
+        stats (SolveStats, optional): Counters of both phases, see `two_phase_solutions`;
+            phase 1 is timed as the search time not spent in phase 2.
+
+    Returns:
+        str: The shortest solution found, or None if there is none within max_length.
+    """
+    load_tables()  # Building missing tables does not count against the budget
+    start = default_timer()
+    deadline = start + time_budget
+    solution = None
+    for solution in two_phase_solutions(facelets_to_cubie(cube_state), deadline, target_length, max_length,
+                                        stats):
+        pass
+    if stats is not None:
+        stats.phase("phase 1").time = default_timer() - start - stats.phase("phase 2").time
+    return solution